@@ -1,15 +1,22 @@
 import requests
 import logging
+import csv
 import time
 import os
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
+from rate_limiter import RateLimiter
+from response_cache import ResponseCache
+from time_series import loads
+import metrics
 from config import (
     LOCAL_API_BASE_URL, LOCAL_API_TIMEOUT, 
     ALPHA_VANTAGE_API_KEY, ALPHA_VANTAGE_BASE_URL,
     MAX_REQUESTS_PER_MINUTE, REQUEST_TIMEOUT,
-    MAX_RETRIES, RETRY_DELAY
+    MAX_RETRIES, RETRY_DELAY, REFRESH_WORKERS,
+    BULK_QUOTE_BATCH_SIZE, VERIFY_API_ACCESS
 )
 
 # Constants
@@ -25,9 +32,10 @@ class APIManager:
     def __init__(self):
         """Initialize API manager"""
         self.session = self._create_session()
-        self.last_request_time = 0
-        self.requests_per_minute = 0
         self.max_requests_per_minute = MAX_REQUESTS_PER_MINUTE
+        self.rate_limiter = RateLimiter.from_config()
+        self.cache = ResponseCache.from_config()
+        self.bulk_quotes_supported = None  # unknown until the first bulk request
         
         # Log API key status
         if not ALPHA_VANTAGE_API_KEY:
@@ -35,7 +43,8 @@ class APIManager:
         else:
             logging.info("Alpha Vantage API key is configured")
             
-        self.verify_api_access()
+        if VERIFY_API_ACCESS:
+            self.verify_api_access()
     
     def _create_session(self):
         """Create a session with retry strategy"""
@@ -45,7 +54,12 @@ class APIManager:
             backoff_factor=RETRY_DELAY,
             status_forcelist=[429, 500, 502, 503, 504]
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
+        # Size the pool for concurrent refresh workers so connections are reused
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=REFRESH_WORKERS,
+            pool_maxsize=REFRESH_WORKERS
+        )
         session.mount("http://", adapter)
         session.mount("https://", adapter)
         return session
@@ -54,6 +68,7 @@ class APIManager:
         """Verify API access and limits"""
         try:
             # Test API access with a simple request
+            self._handle_rate_limit()
             params = {
                 'function': 'TIME_SERIES_INTRADAY',
                 'symbol': 'IBM',  # Use IBM as test symbol
@@ -61,14 +76,10 @@ class APIManager:
                 'apikey': ALPHA_VANTAGE_API_KEY
             }
             
-            response = self.session.get(
-                ALPHA_VANTAGE_BASE_URL,
-                params=params,
-                timeout=REQUEST_TIMEOUT
-            )
+            response = self._request(params)
             
             response.raise_for_status()
-            data = response.json()
+            data = loads(response.content)
             
             # Check for API limit message
             if 'Note' in data:
@@ -83,28 +94,65 @@ class APIManager:
             raise
     
     def _handle_rate_limit(self):
-        """Handle API rate limiting"""
-        current_time = time.time()
-        
-        # Reset counter if a minute has passed
-        if current_time - self.last_request_time >= 60:
-            self.requests_per_minute = 0
-            self.last_request_time = current_time
-        
-        # Check if we're at the limit
-        if self.requests_per_minute >= self.max_requests_per_minute:
-            sleep_time = 60 - (current_time - self.last_request_time)
-            if sleep_time > 0:
-                logging.info(f"Rate limit reached. Sleeping for {sleep_time:.2f} seconds")
-                time.sleep(sleep_time)
-                self.requests_per_minute = 0
-                self.last_request_time = time.time()
+        """Wait for the shared rate limiter; returns seconds waited"""
+        wait = self.rate_limiter.acquire()
+        metrics.RATE_LIMIT_WAIT.observe(wait)
+        if wait >= 1:
+            logging.info(
+                f"Rate limited for {wait:.2f} seconds ({self.rate_limiter.tokens_available()} tokens left)",
+                extra={'rate_limit_wait_ms': round(wait * 1000, 1)}
+            )
+        return wait
+    
+    def _request(self, params, **kwargs):
+        """GET from Alpha Vantage, recording status, latency and adapter retries"""
+        function = params['function']
+        start = time.perf_counter()
+        try:
+            response = self.session.get(ALPHA_VANTAGE_BASE_URL, params=params, timeout=REQUEST_TIMEOUT, **kwargs)
+        except Exception:
+            metrics.API_LATENCY.observe(time.perf_counter() - start, function=function)
+            metrics.API_REQUESTS.inc(function=function, status='error')
+            raise
+        latency = time.perf_counter() - start
+        metrics.API_LATENCY.observe(latency, function=function)
+        metrics.API_REQUESTS.inc(function=function, status=response.status_code)
+        retries = getattr(getattr(response.raw, 'retries', None), 'history', ())
+        if retries:
+            metrics.API_RETRIES.inc(len(retries), function=function)
+        # One structured line per request, ready for latency analysis
+        logging.info("Alpha Vantage request", extra={
+            'function': function,
+            'symbol': params.get('symbol'),
+            'status': response.status_code,
+            'latency_ms': round(latency * 1000, 1),
+            'retries': len(retries)
+        })
+        return response
+    
+    def rate_limit_stats(self):
+        """Tokens left and time spent waiting on the rate limiter"""
+        return self.rate_limiter.stats()
+    
+    def cache_stats(self):
+        """Response cache hit/miss counters"""
+        return self.cache.stats()
+    
+    def get_stock_data(self, symbol, function='TIME_SERIES_WEEKLY', use_cache=True):
+        """Get stock data from Alpha Vantage, served from the response cache when fresh"""
+        # Cache hits never touch the rate limiter
+        if use_cache:
+            cached = self.cache.get(function, symbol)
+            if cached is not None:
+                metrics.API_CACHE_HITS.inc(function=function)
+                return cached
         
-        # Increment request counter
-        self.requests_per_minute += 1
+        result = self._fetch(symbol, function)
+        self.cache.set(function, symbol, result)
+        return result
     
-    def get_stock_data(self, symbol, function='TIME_SERIES_WEEKLY'):
-        """Get stock data from Alpha Vantage"""
+    def _fetch(self, symbol, function):
+        """Request a function from Alpha Vantage over the network"""
         try:
             self._handle_rate_limit()
             
@@ -116,55 +164,133 @@ class APIManager:
             if function != 'LISTING_STATUS':
                 params['symbol'] = symbol
                 
-            logging.info(f"Making API request for {function} {'for ' + symbol if symbol else ''}")
-            
-            response = self.session.get(
-                ALPHA_VANTAGE_BASE_URL,
-                params=params,
-                timeout=REQUEST_TIMEOUT
-            )
-            
-            logging.info(f"API response status code: {response.status_code}")
+            response = self._request(params, stream=function == 'LISTING_STATUS')
             
             if response.status_code != 200:
-                logging.error(f"API error response: {response.text}")
+                # Error bodies can be large pages; keep a sample
+                logging.error(
+                    f"API error response: {response.text[:500]}",
+                    extra={'function': function, 'symbol': symbol, 'sample_key': 'api_error_body'}
+                )
                 response.raise_for_status()
             
             if function == 'LISTING_STATUS':
-                # Log the raw response for debugging
-                logging.info(f"Raw listing response: {response.text[:1000]}")  # Log first 1000 chars
-                
-                # Parse CSV response
-                lines = [line.strip() for line in response.text.strip().split('\n')]
-                if len(lines) < 2:  # Need at least header and one data row
-                    logging.error(f"Not enough lines in response. Lines: {len(lines)}")
-                    return []
-                    
-                header = [h.strip() for h in lines[0].split(',')]
-                logging.info(f"CSV header: {header}")
-                
-                stocks = []
-                for line in lines[1:]:
-                    if not line.strip():  # Skip empty lines
-                        continue
-                    values = [v.strip() for v in line.split(',')]
-                    if len(values) == len(header):
-                        stock = dict(zip(header, values))
-                        if stock.get('status') == 'Active' and stock.get('assetType') == 'Stock':
-                            stocks.append({
-                                'symbol': stock.get('symbol', ''),
-                                'name': stock.get('name', ''),
-                                'exchange': stock.get('exchange', '')
-                            })
-                logging.info(f"Processed {len(stocks)} stocks from listing")
-                return stocks
-            else:
-                return response.json()
+                return list(self._parse_listing(response))
+            return loads(response.content)
             
         except Exception as e:
             logging.error(f"Error fetching stock data: {str(e)}")
             raise
     
+    def get_bulk_quotes(self, symbols, fallback=True, failed=None):
+        """Latest price and volume for many symbols: {symbol: {'price', 'volume'}}
+        
+        Uses REALTIME_BULK_QUOTES (up to 100 symbols per request). If the API
+        key is not entitled to it, stops trying the bulk endpoint for this
+        manager and, unless fallback is False, uses concurrent GLOBAL_QUOTE
+        requests instead. A batch whose request fails (HTTP error, timeout,
+        bad body) is logged and skipped, its symbols appended to failed, and
+        the other batches' quotes are still returned.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        quotes = {}
+        if self.bulk_quotes_supported is not False:
+            for start in range(0, len(symbols), BULK_QUOTE_BATCH_SIZE):
+                batch = symbols[start:start + BULK_QUOTE_BATCH_SIZE]
+                try:
+                    rows = self._fetch_bulk_quotes(batch)
+                except (requests.RequestException, ValueError) as e:
+                    logging.warning(f"Bulk quote request for {len(batch)} symbols failed: {str(e)}")
+                    if failed is not None:
+                        failed.extend(batch)
+                    continue
+                if rows is None:
+                    break
+                for row in rows:
+                    quote = self._quote_from_bulk_row(row)
+                    if quote:
+                        quotes[row['symbol']] = quote
+        missing = [symbol for symbol in symbols if symbol not in quotes]
+        if missing and fallback and self.bulk_quotes_supported is not True:
+            with ThreadPoolExecutor(max_workers=REFRESH_WORKERS) as executor:
+                for symbol, quote in zip(missing, executor.map(self._single_quote, missing)):
+                    if quote:
+                        quotes[symbol] = quote
+        return quotes
+    
+    def _fetch_bulk_quotes(self, symbols):
+        """One REALTIME_BULK_QUOTES request; returns rows or None if unavailable"""
+        self._handle_rate_limit()
+        response = self._request({
+            'function': 'REALTIME_BULK_QUOTES',
+            'symbol': ','.join(symbols),
+            'apikey': ALPHA_VANTAGE_API_KEY
+        })
+        response.raise_for_status()
+        payload = loads(response.content)
+        rows = payload.get('data')
+        if not isinstance(rows, list):
+            # Premium-only endpoint: the API answers with a message instead of data
+            message = payload.get('message') or payload.get('Information') or payload.get('Note')
+            logging.warning(f"Bulk quotes unavailable, using single quotes: {message}")
+            self.bulk_quotes_supported = False
+            return None
+        self.bulk_quotes_supported = True
+        for row in rows:
+            # Seed the GLOBAL_QUOTE cache so single-symbol lookups are free
+            quote = self._quote_from_bulk_row(row)
+            if quote:
+                self.cache.set('GLOBAL_QUOTE', row['symbol'], {'Global Quote': {
+                    '01. symbol': row['symbol'],
+                    '05. price': str(quote['price']),
+                    '06. volume': str(quote['volume'])
+                }})
+        return rows
+    
+    def _quote_from_bulk_row(self, row):
+        try:
+            return {'price': float(row['close']), 'volume': int(float(row.get('volume') or 0))}
+        except (KeyError, TypeError, ValueError):
+            return None
+    
+    def _single_quote(self, symbol):
+        try:
+            quote = self.get_stock_data(symbol=symbol, function='GLOBAL_QUOTE').get('Global Quote', {})
+            return {'price': float(quote['05. price']), 'volume': int(quote.get('06. volume') or 0)}
+        except Exception as e:
+            logging.warning(f"Could not get quote for {symbol}: {str(e)}")
+            return None
+    
+    def _parse_listing(self, response):
+        """Stream active stocks out of a LISTING_STATUS CSV response
+        
+        Rows are read with the csv module as they arrive, so quoted names
+        containing commas parse correctly and the full body is never held
+        in memory.
+        """
+        response.encoding = response.encoding or 'utf-8'
+        reader = csv.DictReader(response.iter_lines(decode_unicode=True))
+        count = 0
+        for row in reader:
+            if row.get('status') == 'Active' and row.get('assetType') == 'Stock':
+                count += 1
+                yield {
+                    'symbol': (row.get('symbol') or '').strip(),
+                    'name': (row.get('name') or '').strip(),
+                    'exchange': (row.get('exchange') or '').strip()
+                }
+        logging.info(f"Processed {count} stocks from listing")
+    
+    def iter_listing(self):
+        """Stream the active stock listing without caching or materializing it"""
+        self._handle_rate_limit()
+        with self._request(
+            {'function': 'LISTING_STATUS', 'apikey': ALPHA_VANTAGE_API_KEY},
+            stream=True
+        ) as response:
+            response.raise_for_status()
+            yield from self._parse_listing(response)
+    
     def get_local_stock_data(self):
         """Get stock data from local API"""
         try:
@@ -0,0 +1,317 @@
+"""Backtest AO/AC entry and exit rules over the stored weekly bars.
+
+Every symbol's bars are aligned on a shared date axis (a symbols x weeks
+panel), so indicators, signals, positions and returns are whole-array
+operations with no per-bar Python loop. Parameter combinations are spread
+over a process pool; each worker receives the panel once.
+
+Rules (long only; a position opened at a week's close is held from the
+next week on, and exits win when both fire on the same bar):
+
+- zero_cross  enter when AO crosses above zero, exit when it crosses below
+- saucer      enter on a bullish saucer (AO above zero, one lower bar
+              followed by a higher one), exit when AO crosses below zero
+- ac          enter after ac_bars rising AC bars above zero, exit after
+              ac_bars falling AC bars below zero
+
+Per-symbol results are compared with buy and hold; the portfolio holds an
+equal share of every symbol that has a price that week.
+
+Usage: python backtest.py [--snapshot DIR] [--rules zero_cross saucer ac]
+       [--fast 3 5 8] [--slow 21 34 55] [--ac-window 5] [--ac-bars 2]
+       [--cost-bps 10] [--workers N] [--top 10] [--output report.json]
+"""
+import argparse
+import itertools
+import json
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import indicators
+from config import BACKTEST_WORKERS, BACKTEST_COST_BPS
+
+RULES = ('zero_cross', 'saucer', 'ac')
+PERIODS_PER_YEAR = 52
+
+
+class Panel:
+    """Bars for many symbols on one date axis; missing weeks are NaN"""
+
+    __slots__ = ('symbols', 'dates', 'high', 'low', 'close')
+
+    def __init__(self, symbols, dates, high, low, close):
+        self.symbols = symbols
+        self.dates = dates
+        self.high = high
+        self.low = low
+        self.close = close
+
+    @classmethod
+    def from_series(cls, series_by_symbol):
+        """Align {symbol: BarSeries} on the union of their dates"""
+        symbols = [symbol for symbol, series in series_by_symbol.items() if len(series)]
+        dates = np.unique(np.concatenate([series_by_symbol[s].dates for s in symbols] or [np.empty(0, np.int64)]))
+        shape = (len(symbols), len(dates))
+        high, low, close = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+        for row, symbol in enumerate(symbols):
+            series = series_by_symbol[symbol]
+            columns = np.searchsorted(dates, series.dates)
+            high[row, columns] = series.high
+            low[row, columns] = series.low
+            close[row, columns] = series.close
+        return cls(symbols, dates, high, low, close)
+
+
+def load_panel(snapshot_path=None, symbols=None):
+    """Panel from a snapshot directory, or from MongoDB for the watchlist"""
+    if snapshot_path:
+        from snapshot import Snapshot
+        snapshot = Snapshot(snapshot_path)
+        symbols = symbols or snapshot.symbols
+        return Panel.from_series({symbol: snapshot.series(symbol) for symbol in symbols if symbol in snapshot})
+    from db_manager import DatabaseManager
+    db_manager = DatabaseManager()
+    if not symbols:
+        symbols = [doc['symbol'] for doc in db_manager.get_database().watchlist.find({}, {'symbol': 1})]
+    return Panel.from_series({symbol: db_manager.get_bars(symbol) for symbol in sorted(symbols)})
+
+
+def _shift(values, periods):
+    """values delayed by periods bars along the last axis, NaN-filled"""
+    out = np.full(values.shape, np.nan)
+    out[..., periods:] = values[..., :values.shape[-1] - periods]
+    return out
+
+
+def _for_bars(condition, bars):
+    """True where condition held on each of the last bars bars"""
+    result = condition.copy()
+    for periods in range(1, bars):
+        result[..., periods:] &= condition[..., :condition.shape[-1] - periods]
+    result[..., :bars - 1] = False
+    return result
+
+
+def signals(rule, ao, ac, ac_bars=2):
+    """(entries, exits) boolean arrays for a rule"""
+    previous = _shift(ao, 1)
+    crossed_below = (previous >= 0) & (ao < 0)
+    if rule == 'zero_cross':
+        return (previous <= 0) & (ao > 0), crossed_below
+    if rule == 'saucer':
+        before = _shift(ao, 2)
+        saucer = (before > 0) & (previous > 0) & (ao > 0) & (before > previous) & (ao > previous)
+        return saucer, crossed_below
+    if rule == 'ac':
+        change = ac - _shift(ac, 1)
+        return _for_bars((ac > 0) & (change > 0), ac_bars), _for_bars((ac < 0) & (change < 0), ac_bars)
+    raise ValueError(f"Unknown rule {rule!r}; expected one of {', '.join(RULES)}")
+
+
+def positions(entries, exits):
+    """1.0 from an entry until the next exit, else 0.0 (no per-bar loop)
+
+    Each bar looks up the most recent bar that had a signal by carrying
+    signal indices forward with a running maximum.
+    """
+    signal = np.where(exits, -1, np.where(entries, 1, 0)).astype(np.int8)
+    index = np.where(signal != 0, np.arange(signal.shape[-1]), 0)
+    np.maximum.accumulate(index, axis=-1, out=index)
+    return (np.take_along_axis(signal, index, axis=-1) == 1).astype(np.float64)
+
+
+def asset_returns(close):
+    """Week-over-week returns, 0 where either close is missing"""
+    returns = np.zeros(close.shape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[..., 1:] = close[..., 1:] / close[..., :-1] - 1
+    return np.nan_to_num(returns, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+def strategy_returns(close, position, cost):
+    """Returns of holding position (decided at each close) from the next bar, net of cost per trade
+
+    Also returns the position actually held in each period.
+    """
+    held = _shift(position, 1)
+    held[..., 0] = 0.0
+    trades = np.abs(np.diff(held, axis=-1, prepend=0.0))
+    return held * asset_returns(close) - cost * trades, held
+
+
+def portfolio_returns(returns, close):
+    """Equal weight across the symbols priced in both weeks of each period"""
+    live = np.zeros(close.shape, dtype=bool)
+    live[:, 1:] = ~np.isnan(close[:, 1:]) & ~np.isnan(close[:, :-1])
+    counts = live.sum(axis=0)
+    return np.where(counts > 0, (returns * live).sum(axis=0) / np.maximum(counts, 1), 0.0)
+
+
+def performance(returns):
+    """Total return, CAGR, volatility, Sharpe and max drawdown of a return series"""
+    periods = len(returns)
+    if not periods:
+        return {'total_return': 0.0, 'cagr': 0.0, 'volatility': 0.0, 'sharpe': None, 'max_drawdown': 0.0}
+    equity = np.cumprod(1 + returns)
+    total = float(equity[-1] - 1)
+    std = float(returns.std())
+    drawdown = equity / np.maximum.accumulate(equity) - 1
+    return {
+        'total_return': total,
+        'cagr': float((1 + total) ** (PERIODS_PER_YEAR / periods) - 1) if total > -1 else -1.0,
+        'volatility': std * PERIODS_PER_YEAR ** 0.5,
+        'sharpe': float(returns.mean() / std * PERIODS_PER_YEAR ** 0.5) if std else None,
+        'max_drawdown': float(drawdown.min())
+    }
+
+
+def evaluate(panel, params):
+    """Backtest one parameter set over every symbol in the panel at once"""
+    ao = indicators.awesome_oscillator(panel.high, panel.low, params['fast'], params['slow'])
+    ac = indicators.acceleration_deceleration(ao, params['ac_window'])
+    entries, exits = signals(params['rule'], ao, ac, params['ac_bars'])
+    returns, held = strategy_returns(panel.close, positions(entries, exits), params['cost_bps'] / 10_000)
+    hold = asset_returns(panel.close)
+    return {
+        'params': params,
+        'portfolio': performance(portfolio_returns(returns, panel.close)),
+        'buy_hold': performance(portfolio_returns(hold, panel.close)),
+        # Per-symbol arrays in panel.symbols order (cheap to send back from a worker)
+        'symbol_returns': np.expm1(np.log1p(returns).sum(axis=-1)),
+        'symbol_buy_hold': np.expm1(np.log1p(hold).sum(axis=-1)),
+        'symbol_trades': (np.diff(held, axis=-1, prepend=0.0) > 0).sum(axis=-1),
+        'symbol_exposure': held.mean(axis=-1)
+    }
+
+
+def parameter_grid(rules=RULES, fast=(indicators.AO_FAST,), slow=(indicators.AO_SLOW,),
+                   ac_window=(indicators.AC_WINDOW,), ac_bars=(2,), cost_bps=BACKTEST_COST_BPS):
+    """Every combination with fast < slow; ac_* only vary for the ac rule"""
+    grid = []
+    for rule, fast_window, slow_window in itertools.product(rules, fast, slow):
+        if fast_window >= slow_window:
+            continue
+        ac_options = itertools.product(ac_window, ac_bars) if rule == 'ac' else [(ac_window[0], ac_bars[0])]
+        for window, bars in ac_options:
+            grid.append({
+                'rule': rule, 'fast': fast_window, 'slow': slow_window,
+                'ac_window': window, 'ac_bars': bars, 'cost_bps': cost_bps
+            })
+    return grid
+
+
+_worker_panel = None
+
+
+def _init_worker(panel):
+    global _worker_panel
+    _worker_panel = panel
+
+
+def _evaluate_in_worker(params):
+    return evaluate(_worker_panel, params)
+
+
+def run_backtest(panel, grid, workers=BACKTEST_WORKERS):
+    """Results for every parameter set, in grid order"""
+    if workers <= 1 or len(grid) <= 1:
+        return [evaluate(panel, params) for params in grid]
+    with ProcessPoolExecutor(max_workers=min(workers, len(grid)), initializer=_init_worker, initargs=(panel,)) as executor:
+        return list(executor.map(_evaluate_in_worker, grid))
+
+
+def symbol_report(panel, result):
+    """Per-symbol rows for one result, best strategy return first"""
+    rows = [
+        {
+            'symbol': symbol,
+            'total_return': float(result['symbol_returns'][i]),
+            'buy_hold_return': float(result['symbol_buy_hold'][i]),
+            'trades': int(result['symbol_trades'][i]),
+            'exposure': float(result['symbol_exposure'][i])
+        }
+        for i, symbol in enumerate(panel.symbols)
+    ]
+    return sorted(rows, key=lambda row: row['total_return'], reverse=True)
+
+
+def _label(params):
+    label = f"{params['rule']} AO {params['fast']}/{params['slow']}"
+    if params['rule'] == 'ac':
+        label += f" AC {params['ac_window']}x{params['ac_bars']}"
+    return label
+
+
+def _pct(value):
+    return f"{value * 100:8.1f}%"
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--snapshot', help='read bars from this snapshot instead of MongoDB')
+    parser.add_argument('--symbols', nargs='+', help='default: the whole snapshot or watchlist')
+    parser.add_argument('--rules', nargs='+', choices=RULES, default=list(RULES))
+    parser.add_argument('--fast', type=int, nargs='+', default=[3, 5, 8], help='AO fast SMA windows')
+    parser.add_argument('--slow', type=int, nargs='+', default=[21, 34, 55], help='AO slow SMA windows')
+    parser.add_argument('--ac-window', type=int, nargs='+', default=[indicators.AC_WINDOW])
+    parser.add_argument('--ac-bars', type=int, nargs='+', default=[2], help='consecutive AC bars for the ac rule')
+    parser.add_argument('--cost-bps', type=float, default=BACKTEST_COST_BPS, help='cost per entry or exit')
+    parser.add_argument('--workers', type=int, default=BACKTEST_WORKERS)
+    parser.add_argument('--top', type=int, default=10, help='symbols to list for the best parameter set')
+    parser.add_argument('--output', help='write the full JSON report here')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    panel = load_panel(args.snapshot, args.symbols)
+    loaded = time.perf_counter() - start
+    if not panel.symbols:
+        print("No bars to backtest")
+        return
+    grid = parameter_grid(args.rules, args.fast, args.slow, args.ac_window, args.ac_bars, args.cost_bps)
+    start = time.perf_counter()
+    results = run_backtest(panel, grid, args.workers)
+    elapsed = time.perf_counter() - start
+    results.sort(key=lambda result: (result['portfolio']['sharpe'] is not None, result['portfolio']['sharpe'] or 0),
+                 reverse=True)
+
+    first, last = (str(d) for d in panel.dates[[0, -1]].astype('datetime64[D]'))
+    print(f"{len(panel.symbols)} symbols, {len(panel.dates)} weeks ({first}..{last}), loaded in {loaded:.2f}s")
+    print(f"{len(grid)} parameter sets in {elapsed:.2f}s with {min(args.workers, len(grid))} worker(s)\n")
+    print(f"{'parameters':<28} {'total':>9} {'CAGR':>9} {'max DD':>9} {'Sharpe':>7}")
+    for result in results:
+        stats = result['portfolio']
+        sharpe = f"{stats['sharpe']:7.2f}" if stats['sharpe'] is not None else f"{'-':>7}"
+        print(f"{_label(result['params']):<28} {_pct(stats['total_return'])} {_pct(stats['cagr'])} "
+              f"{_pct(stats['max_drawdown'])} {sharpe}")
+    hold = results[0]['buy_hold']
+    print(f"{'buy and hold':<28} {_pct(hold['total_return'])} {_pct(hold['cagr'])} {_pct(hold['max_drawdown'])}")
+
+    best = results[0]
+    rows = symbol_report(panel, best)
+    print(f"\nTop symbols for {_label(best['params'])}:")
+    print(f"{'symbol':<10} {'return':>9} {'buy/hold':>9} {'trades':>7} {'exposure':>9}")
+    for row in rows[:args.top]:
+        print(f"{row['symbol']:<10} {_pct(row['total_return'])} {_pct(row['buy_hold_return'])} "
+              f"{row['trades']:>7} {_pct(row['exposure'])}")
+
+    if args.output:
+        report = {
+            'symbols': len(panel.symbols),
+            'weeks': len(panel.dates),
+            'first_date': first,
+            'last_date': last,
+            'results': [
+                {'params': r['params'], 'portfolio': r['portfolio'], 'buy_hold': r['buy_hold'],
+                 'symbols': symbol_report(panel, r)}
+                for r in results
+            ]
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+        print(f"\nReport written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+from datetime import date, datetime
+import numpy as np
+from time_series import PRICE_FIELDS, format_dates, weekly_columns
+
+FIELDS = PRICE_FIELDS + ('volume',)
+
+
+def to_days(value):
+    """'YYYY-MM-DD', date/datetime or int days since 1970-01-01 -> int days"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, (str, date)):
+        return int(np.datetime64(value, 'D').astype(np.int64))
+    raise TypeError(f"Cannot use {value!r} as a bar date")
+
+
+class BarSeries:
+    """One symbol's bars as NumPy columns, oldest first
+
+    dates holds int64 days since 1970-01-01; open/high/low/close are float64
+    and volume int64, so a bar costs 48 bytes instead of a dict of seven
+    Python objects. Slicing returns views onto the same buffers and dates
+    are looked up by binary search. Individual bars come back as the dicts
+    stored in stocks.latest_bar ({'timestamp', 'open', ..., 'volume'}).
+    """
+
+    __slots__ = ('dates',) + FIELDS
+
+    def __init__(self, dates, open, high, low, close, volume):
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.open = np.asarray(open, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+        self.volume = np.asarray(volume, dtype=np.int64)
+
+    @classmethod
+    def empty(cls):
+        return cls([], [], [], [], [], [])
+
+    @classmethod
+    def from_columns(cls, columns):
+        """From time_series.weekly_columns output (already sorted)"""
+        return cls(columns['date'], *(columns[field] for field in FIELDS))
+
+    @classmethod
+    def from_payload(cls, time_series):
+        """From an Alpha Vantage 'Weekly Time Series' mapping"""
+        return cls.from_columns(weekly_columns(time_series))
+
+    @classmethod
+    def from_bars(cls, bars):
+        """From a date-keyed dict of bar dicts (the pre-BarSeries format)"""
+        date_strs = sorted(bars)
+        columns = [[bars[d][field] for d in date_strs] for field in FIELDS]
+        return cls(np.array(date_strs, dtype='datetime64[D]').astype(np.int64), *columns)
+
+    @classmethod
+    def from_documents(cls, docs):
+        """From bars collection documents sorted by timestamp"""
+        docs = list(docs)
+        dates = np.array([doc['timestamp'] for doc in docs], dtype='datetime64[D]').astype(np.int64)
+        return cls(dates, *([doc[field] for doc in docs] for field in FIELDS))
+
+    @classmethod
+    def coerce(cls, bars):
+        """Accept either a BarSeries or a date-keyed bar dict"""
+        return bars if isinstance(bars, cls) else cls.from_bars(bars)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __bool__(self):
+        return len(self.dates) > 0
+
+    def __getitem__(self, key):
+        """Slice -> BarSeries view; int position or date -> bar dict"""
+        if isinstance(key, slice):
+            return BarSeries(self.dates[key], *(getattr(self, field)[key] for field in FIELDS))
+        if isinstance(key, (int, np.integer)):
+            return self.bar(key)
+        position = self.find(key)
+        if position is None:
+            raise KeyError(key)
+        return self.bar(position)
+
+    def __contains__(self, key):
+        return self.find(key) is not None
+
+    def __eq__(self, other):
+        if not isinstance(other, BarSeries):
+            return NotImplemented
+        return all(np.array_equal(getattr(self, name), getattr(other, name)) for name in self.__slots__)
+
+    def __repr__(self):
+        span = f"{self.first_date}..{self.last_date}" if self else 'empty'
+        return f"<BarSeries {len(self)} bars {span}>"
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in self.__slots__)
+
+    @property
+    def first_date(self):
+        return format_dates(self.dates[:1])[0] if self else None
+
+    @property
+    def last_date(self):
+        return format_dates(self.dates[-1:])[0] if self else None
+
+    def date_strings(self):
+        return format_dates(self.dates)
+
+    def find(self, key):
+        """Position of the bar on a date, or None"""
+        days = to_days(key)
+        position = int(np.searchsorted(self.dates, days))
+        if position < len(self.dates) and self.dates[position] == days:
+            return position
+        return None
+
+    def get(self, key, default=None):
+        position = self.find(key)
+        return default if position is None else self.bar(position)
+
+    def between(self, start=None, end=None):
+        """View of the bars from start to end, both inclusive and optional"""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, to_days(start), side='left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, to_days(end), side='right'))
+        return self[lo:hi]
+
+    def tail(self, n):
+        return self[max(len(self) - n, 0):]
+
+    def bar(self, position):
+        date_str = format_dates(self.dates[position:position + 1 or None])[0]
+        bar = {'timestamp': date_str + 'T00:00:00'}
+        for field in FIELDS:
+            bar[field] = getattr(self, field)[position].item()
+        return bar
+
+    def latest(self):
+        return self.bar(-1) if self else None
+
+    def items(self):
+        """(date string, bar dict) pairs, oldest first"""
+        dates = self.date_strings()
+        columns = [getattr(self, field).tolist() for field in FIELDS]
+        for date_str, *values in zip(dates, *columns):
+            yield date_str, dict(zip(('timestamp',) + FIELDS, [date_str + 'T00:00:00'] + values))
+
+    def to_bars(self):
+        """The pre-BarSeries date-keyed dict"""
+        return dict(self.items())
+
+    def to_documents(self, symbol):
+        """bars collection documents ({'symbol', 'timestamp': datetime, OHLCV})"""
+        timestamps = self.dates.astype('datetime64[D]').astype('datetime64[us]').tolist()
+        columns = [getattr(self, field).tolist() for field in FIELDS]
+        return [
+            dict(zip(('symbol', 'timestamp') + FIELDS, (symbol, timestamp, *values)))
+            for timestamp, *values in zip(timestamps, *columns)
+        ]
+
+    def changed_from(self, other):
+        """Bars of self that other lacks or holds with different values (a copy)"""
+        if not len(other):
+            return self
+        positions = np.minimum(np.searchsorted(other.dates, self.dates), len(other) - 1)
+        same = other.dates[positions] == self.dates
+        for field in FIELDS:
+            same &= getattr(other, field)[positions] == getattr(self, field)
+        changed = ~same
+        return BarSeries(self.dates[changed], *(getattr(self, field)[changed] for field in FIELDS))
+
+    def merge(self, other):
+        """Bars from both series, taking other's bar where both have a date"""
+        keep = ~np.isin(self.dates, other.dates)
+        dates = np.concatenate([self.dates[keep], other.dates])
+        order = np.argsort(dates, kind='stable')
+        return BarSeries(dates[order], *(
+            np.concatenate([getattr(self, field)[keep], getattr(other, field)])[order] for field in FIELDS
+        ))
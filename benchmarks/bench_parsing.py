@@ -0,0 +1,89 @@
+"""Micro-benchmark for decoding and parsing TIME_SERIES_WEEKLY payloads.
+
+Compares, per symbol payload:
+
+- legacy    json.loads, then strptime/isoformat and float()/int() per row
+            into a dict per bar (the old StockAgent.process_time_series)
+- decode    time_series.loads alone (orjson when installed)
+- columns   time_series.loads + weekly_columns (int64 days, float64/int64 OHLCV)
+- series    time_series.loads + BarSeries.from_payload (what
+            StockAgent.process_time_series returns)
+
+Results are checked against the legacy path before timing.
+
+Usage: python benchmarks/bench_parsing.py [--weeks 1300] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_alpha_vantage  # noqa: E402  (same directory)
+import time_series  # noqa: E402
+from bar_series import BarSeries  # noqa: E402
+
+
+def legacy(raw):
+    series = json.loads(raw)['Weekly Time Series']
+    bars = {}
+    for date_str, values in series.items():
+        bars[date_str] = {
+            'timestamp': datetime.strptime(date_str, '%Y-%m-%d').isoformat(),
+            'open': float(values['1. open']),
+            'high': float(values['2. high']),
+            'low': float(values['3. low']),
+            'close': float(values['4. close']),
+            'volume': int(values['5. volume'])
+        }
+    return bars
+
+
+def decode(raw):
+    return time_series.loads(raw)['Weekly Time Series']
+
+
+def columns(raw):
+    return time_series.weekly_columns(decode(raw))
+
+
+def series(raw):
+    return BarSeries.from_payload(decode(raw))
+
+
+def best_of(func, raw, repeat):
+    """Fastest of repeat runs, in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(raw)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--weeks', type=int, default=1300, help='rows per payload')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    raw = json.dumps(fake_alpha_vantage.weekly('SYM00000', args.weeks)).encode()
+    expected = legacy(raw)
+    if series(raw).to_bars() != expected:
+        sys.exit("BarSeries output differs from the legacy parser")
+
+    decoder = 'orjson' if time_series.orjson is not None else 'json'
+    print(f"{args.weeks} weekly rows, {len(raw) / 1024:.0f} KiB payload, decoder {decoder}")
+    print(f"{'path':<8} {'ms':>8} {'speedup':>8}")
+    baseline = best_of(legacy, raw, args.repeat)
+    for name, func in (('legacy', legacy), ('decode', decode), ('columns', columns), ('series', series)):
+        elapsed = baseline if func is legacy else best_of(func, raw, args.repeat)
+        print(f"{name:<8} {elapsed:>8.3f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+"""Compare the original /api/stocks implementation with the aggregation pipeline.
+
+Seeds a scratch database with N stocks in both layouts, then times and
+measures peak Python memory for:
+
+- legacy:   list(db.stocks.find()) of full documents with embedded weekly
+            history, tree built in Python (the pre-pipeline app.get_stocks)
+- pipeline: dashboard_cache.stream_stock_tree over projected documents
+
+Usage: python benchmarks/bench_stocks_endpoint.py [--sizes 35 1000 10000]
+       [--weeks 520] [--repeat 5] [--mongo-uri mongodb://localhost:27017]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import pymongo
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import MONGO_URI
+from dashboard_cache import stream_stock_tree
+
+BENCH_DB = 'stock_data_bench'
+SECTORS = ['TECHNOLOGY', 'FINANCE', 'ENERGY', 'HEALTHCARE', 'MANUFACTURING', 'None']
+
+
+def make_history(weeks):
+    start = date(2024, 12, 27) - timedelta(weeks=weeks)
+    data = {}
+    for i in range(weeks):
+        day = (start + timedelta(weeks=i)).isoformat()
+        close = random.uniform(5, 100)
+        data[day] = {
+            'timestamp': f"{day}T00:00:00",
+            'open': close, 'high': close * 1.05, 'low': close * 0.95,
+            'close': close, 'volume': random.randint(10_000, 10_000_000)
+        }
+    return data
+
+
+def seed(db, size, weeks):
+    """Write size stocks in the legacy (embedded) and current layouts"""
+    db.legacy_stocks.drop()
+    db.stocks.drop()
+    history = make_history(weeks)
+    last_bar_date = max(history)
+    legacy, current = [], []
+    for i in range(size):
+        base = {
+            'symbol': f"SYM{i:05d}",
+            'sector': random.choice(SECTORS),
+            'industry': f"INDUSTRY {random.randint(0, 40)}",
+            'market_cap': str(random.randint(2_000_000_000, 900_000_000_000)),
+            'indicators': {'ao': random.uniform(-5, 5), 'ac': random.uniform(-1, 1)}
+        }
+        legacy.append(dict(base, data=history))
+        current.append(dict(base, last_bar_date=last_bar_date, latest_bar=history[last_bar_date]))
+        if len(legacy) == 500:
+            db.legacy_stocks.insert_many(legacy)
+            db.stocks.insert_many(current)
+            legacy, current = [], []
+    if legacy:
+        db.legacy_stocks.insert_many(legacy)
+        db.stocks.insert_many(current)
+
+
+def legacy_get_stocks(db):
+    """The original app.get_stocks body, minus its print calls"""
+    stocks = list(db.legacy_stocks.find({}, {'_id': 0}))
+    sectors = {}
+    result = []
+    for stock in stocks:
+        sector = stock.get('sector', 'Unknown')
+        if sector == 'None':
+            sector = 'Unknown'
+        if sector not in sectors:
+            sectors[sector] = {'name': sector, 'type': 'sector', 'children': {}}
+        industry = stock.get('industry', 'Unknown')
+        if industry == 'None':
+            industry = 'Unknown'
+        if industry not in sectors[sector]['children']:
+            sectors[sector]['children'][industry] = {'name': industry, 'type': 'industry', 'children': []}
+        market_cap = float(stock.get('market_cap', 0)) if stock.get('market_cap') not in [None, 'None'] else 0
+        indicators = stock.get('indicators') or {}
+        latest = stock['data'][max(stock['data'].keys())]
+        sectors[sector]['children'][industry]['children'].append({
+            'name': stock.get('symbol'), 'type': 'stock', 'market_cap': market_cap,
+            'price': float(latest['close']), 'volume': float(latest['volume']),
+            'ao': float(indicators.get('ao', 0)), 'ac': float(indicators.get('ac', 0)),
+            'sector': sector, 'industry': industry
+        })
+    for sector_name, sector_data in sectors.items():
+        result.append({
+            'name': sector_name, 'type': 'sector',
+            'children': [
+                {'name': name, 'type': 'industry', 'children': data['children']}
+                for name, data in sector_data['children'].items()
+            ]
+        })
+    return json.dumps(result).encode()
+
+
+def pipeline_get_stocks(db):
+    return b''.join(stream_stock_tree(db))
+
+
+def measure(func, db, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(db)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    func(db)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[35, 1000, 10000])
+    parser.add_argument('--weeks', type=int, default=520, help='weekly bars per legacy document')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--mongo-uri', default=MONGO_URI)
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(args.mongo_uri)
+    db = client[BENCH_DB]
+    print(f"{'stocks':>8} {'impl':>9} {'median ms':>10} {'peak MiB':>9}")
+    print("-" * 40)
+    try:
+        for size in args.sizes:
+            seed(db, size, args.weeks)
+            for name, func in (('legacy', legacy_get_stocks), ('pipeline', pipeline_get_stocks)):
+                latency, peak = measure(func, db, args.repeat)
+                print(f"{size:>8} {name:>9} {latency * 1000:>10.1f} {peak / 2**20:>9.1f}")
+    finally:
+        client.drop_database(BENCH_DB)
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+"""End-to-end benchmarks against a local fake Alpha Vantage and MongoDB stand-in.
+
+For each size N a watchlist of N symbols is seeded and the suite times:
+
+- refresh_cold     StockAgent.update_stock_data with nothing stored (full fetch)
+- refresh_warm     the next cycle, which the incremental path skips
+- load_bars        DatabaseManager.get_bars for every symbol
+- indicators       indicators.compute_series per symbol
+- indicators_batch indicators.compute_batch over all symbols
+- publish          dashboard_cache.publish_dashboard
+- api_stocks       GET /api/stocks from the stored snapshot
+- api_stocks_304   the same request revalidated with If-None-Match
+- api_stocks_live  GET /api/stocks built from the live collection
+
+The fake server (benchmarks/fake_alpha_vantage.py) runs in-process. MongoDB
+is a real server when --mongo-uri is given and mongomock otherwise; mongomock
+scans collections linearly on every upsert, so with it sizes above
+--mongomock-max-size are skipped and histories default to 52 weeks. A
+scratch database is used and dropped afterwards.
+
+Each step reports wall seconds and, unless --no-memory, the tracemalloc peak
+(tracing slows the step, so compare reports made with the same flags). The
+JSON report records the commit so runs can be compared with --compare.
+
+Usage: python benchmarks/bench_suite.py [--sizes 35 1000 10000] [--weeks 520]
+       [--mongo-uri mongodb://localhost:27017] [--latency-ms 0] [--rpm 0]
+       [--throttle-rate 0] [--output report.json] [--compare old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import fake_alpha_vantage  # noqa: E402  (same directory)
+
+BENCH_DB = 'stock_data_bench'
+COLLECTIONS = ('stocks', 'bars', 'watchlist', 'dashboard', 'cycle_metrics')
+
+
+def configure_environment(args, base_url, log_dir):
+    """Point the application config at the stand-ins; must run before project imports"""
+    os.environ.update({
+        'ALPHA_VANTAGE_BASE_URL': base_url,
+        'ALPHA_VANTAGE_API_KEY': 'bench',
+        'VERIFY_API_ACCESS': 'false',
+        'MAX_REQUESTS_PER_MINUTE': str(args.client_rpm),
+        'RATE_LIMIT_BACKEND': 'memory',
+        'CACHE_BACKEND': args.cache,
+        'CACHE_DIR': os.path.join(log_dir, 'cache'),
+        'DB_NAME': BENCH_DB,
+        'METRICS_PORT': '0',
+        'LOG_FILE': os.path.join(log_dir, 'stock_agent.log'),
+        'SERVER_LOG_FILE': os.path.join(log_dir, 'server.log')
+    })
+    if args.mongo_uri:
+        os.environ['MONGO_URI'] = args.mongo_uri
+    else:
+        import mongomock
+        import pymongo
+        import mongomock_compat
+        mongomock_compat.install()
+        store = mongomock.store.ServerStore()
+        # Every client the application creates sees the same in-memory data
+        pymongo.MongoClient = lambda *a, **kw: mongomock.MongoClient(*a, _store=store, **kw)
+
+
+def measure(step, func, trace_memory):
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        value = func()
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+    return value, {'step': step, 'seconds': elapsed, 'peak_mib': peak / 2**20 if peak is not None else None}
+
+
+def run_size(size, args):
+    from db_manager import DatabaseManager
+    from dashboard_cache import publish_dashboard, SNAPSHOT_COLLECTION, STOCK_TREE
+    from stock_agent import StockAgent
+    import indicators
+    import server
+
+    db_manager = DatabaseManager()
+    db = db_manager.get_database()
+    for name in COLLECTIONS:
+        db[name].drop()
+    db.watchlist.insert_many([
+        {'symbol': fake_alpha_vantage.symbol_name(i), 'name': f"SYM{i:05d} Corp", 'exchange': 'NYSE'}
+        for i in range(size)
+    ])
+    agent = StockAgent()
+    symbols = [doc['symbol'] for doc in db.watchlist.find({}, {'symbol': 1})]
+    results = []
+
+    def record(step, func):
+        value, result = measure(step, func, not args.no_memory)
+        result['size'] = size
+        results.append(result)
+        peak = f"{result['peak_mib']:9.1f}" if result['peak_mib'] is not None else f"{'-':>9}"
+        print(f"{size:>7} {step:<17} {result['seconds']:>10.3f} {peak}", flush=True)
+        return value
+
+    stats = record('refresh_cold', agent.update_stock_data)
+    if stats['failed']:
+        print(f"        {len(stats['failed'])} symbols failed during refresh_cold", flush=True)
+    record('refresh_warm', agent.update_stock_data)
+    bar_sets = record('load_bars', lambda: {symbol: db_manager.get_bars(symbol) for symbol in symbols})
+    record('indicators', lambda: [indicators.compute_series(bars) for bars in bar_sets.values()])
+    record('indicators_batch', lambda: indicators.compute_batch(bar_sets))
+    record('publish', lambda: publish_dashboard(db))
+
+    client = server.create_app().test_client()
+    response = record('api_stocks', lambda: client.get('/api/stocks'))
+    etag = response.headers.get('ETag')
+    record('api_stocks_304', lambda: client.get('/api/stocks', headers={'If-None-Match': etag}))
+    db[SNAPSHOT_COLLECTION].delete_one({'_id': STOCK_TREE})
+    record('api_stocks_live', lambda: client.get('/api/stocks').get_data())
+
+    agent.api_manager.close()
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    before = {(r['size'], r['step']): r for r in baseline['results']}
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline_path}):")
+    print(f"{'size':>7} {'step':<17} {'before s':>10} {'after s':>10} {'ratio':>7}")
+    for result in report['results']:
+        old = before.get((result['size'], result['step']))
+        if old and old['seconds']:
+            ratio = result['seconds'] / old['seconds']
+            print(f"{result['size']:>7} {result['step']:<17} {old['seconds']:>10.3f} {result['seconds']:>10.3f} {ratio:>6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[35, 1000, 10000])
+    parser.add_argument('--weeks', type=int, help='weekly bars per symbol (default 520, or 52 with mongomock)')
+    parser.add_argument('--mongo-uri', help='benchmark against this server instead of mongomock')
+    parser.add_argument('--mongomock-max-size', type=int, default=35)
+    parser.add_argument('--latency-ms', type=float, default=0, help='fake API latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--rpm', type=int, default=0, help='fake API answers 429 above this rate (0: never)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of fake API requests answered 429')
+    parser.add_argument('--client-rpm', type=int, default=1_000_000, help="agent's rate limiter setting")
+    parser.add_argument('--cache', default='none', choices=['none', 'disk', 'mongo'], help='response cache backend')
+    parser.add_argument('--fixtures', help='directory of recorded Alpha Vantage payloads')
+    parser.add_argument('--no-memory', action='store_true', help='skip tracemalloc')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--compare', help='earlier JSON report to compare against')
+    args = parser.parse_args()
+    if args.weeks is None:
+        args.weeks = 520 if args.mongo_uri else 52
+
+    fake_server, base_url, fake = fake_alpha_vantage.start(
+        weeks=args.weeks, symbols=max(args.sizes), latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        rpm=args.rpm, throttle_rate=args.throttle_rate, fixtures=args.fixtures
+    )
+    log_dir = tempfile.mkdtemp(prefix='stock_agent_bench_')
+    configure_environment(args, base_url, log_dir)
+
+    sizes = args.sizes
+    if not args.mongo_uri:
+        skipped = [size for size in sizes if size > args.mongomock_max_size]
+        sizes = [size for size in sizes if size <= args.mongomock_max_size]
+        if skipped:
+            print(f"mongomock: skipping sizes {skipped}; pass --mongo-uri to run them")
+
+    print(f"Fake Alpha Vantage at {base_url}, {args.weeks} weeks per symbol, logs in {log_dir}")
+    print(f"{'size':>7} {'step':<17} {'seconds':>10} {'peak MiB':>9}")
+    print("-" * 46)
+    results = []
+    try:
+        for size in sizes:
+            results.extend(run_size(size, args))
+    finally:
+        from db_manager import DatabaseManager
+        DatabaseManager().client.drop_database(BENCH_DB)
+        fake_server.shutdown()
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'created': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'mongo': args.mongo_uri or 'mongomock',
+            'args': vars(args),
+            'fake_api': {'requests': fake.requests, 'throttled': fake.throttled}
+        },
+        'results': results
+    }
+    print(f"\nFake API served {fake.requests} requests ({fake.throttled} throttled)")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == '__main__':
+    main()
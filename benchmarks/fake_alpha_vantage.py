@@ -0,0 +1,221 @@
+"""Local stand-in for the Alpha Vantage query endpoint.
+
+Serves OVERVIEW, TIME_SERIES_WEEKLY, GLOBAL_QUOTE, REALTIME_BULK_QUOTES,
+LISTING_STATUS and TIME_SERIES_INTRADAY. Payloads are replayed from
+--fixtures when a recording exists (<FUNCTION>_<SYMBOL>.json, then
+<FUNCTION>.json; LISTING_STATUS.csv for the listing) and are otherwise
+generated deterministically from the symbol, so runs are repeatable.
+
+Latency and throttling are configurable to mimic the real service: a
+fixed delay plus jitter per request, a requests-per-minute ceiling that
+answers 429 once exceeded, and a random 429 rate.
+
+Usage: python benchmarks/fake_alpha_vantage.py [--port 8765] [--weeks 520]
+       [--symbols 10000] [--latency-ms 50] [--jitter-ms 20] [--rpm 0]
+       [--throttle-rate 0.0] [--fixtures DIR]
+Then: ALPHA_VANTAGE_BASE_URL=http://127.0.0.1:8765/query VERIFY_API_ACCESS=false ...
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from collections import deque
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SECTORS = {
+    'TECHNOLOGY': ['SOFTWARE', 'SEMICONDUCTORS', 'HARDWARE'],
+    'FINANCE': ['BANKS', 'INSURANCE'],
+    'ENERGY': ['OIL & GAS', 'UTILITIES'],
+    'HEALTHCARE': ['BIOTECHNOLOGY', 'MEDICAL DEVICES'],
+    'MANUFACTURING': ['MACHINERY', 'AUTO PARTS']
+}
+LAST_WEEK = date(2024, 12, 27)
+
+
+def symbol_name(i):
+    return f"SYM{i:05d}"
+
+
+def _rng(symbol, salt=''):
+    return random.Random(zlib.crc32(f"{symbol}{salt}".encode()))
+
+
+def overview(symbol):
+    rng = _rng(symbol)
+    sector = rng.choice(sorted(SECTORS))
+    return {
+        'Symbol': symbol,
+        'Name': f"{symbol} Corp",
+        'Sector': sector,
+        'Industry': rng.choice(SECTORS[sector]),
+        'MarketCapitalization': str(rng.randint(500_000_000, 900_000_000_000))
+    }
+
+
+def weekly(symbol, weeks):
+    rng = _rng(symbol, 'weekly')
+    close = rng.uniform(5, 150)
+    series = {}
+    start = LAST_WEEK - timedelta(weeks=weeks - 1)
+    for i in range(weeks):
+        day = (start + timedelta(weeks=i)).isoformat()
+        open_ = close
+        close = max(1.0, open_ * rng.uniform(0.93, 1.07))
+        series[day] = {
+            '1. open': f"{open_:.4f}",
+            '2. high': f"{max(open_, close) * rng.uniform(1.0, 1.04):.4f}",
+            '3. low': f"{min(open_, close) * rng.uniform(0.96, 1.0):.4f}",
+            '4. close': f"{close:.4f}",
+            '5. volume': str(rng.randint(100_000, 50_000_000))
+        }
+    return {
+        'Meta Data': {'1. Information': 'Weekly Prices (open, high, low, close) and Volumes', '2. Symbol': symbol},
+        'Weekly Time Series': dict(reversed(list(series.items())))
+    }
+
+
+def quote(symbol):
+    rng = _rng(symbol, 'quote')
+    return {'symbol': symbol, 'close': f"{rng.uniform(5, 150):.2f}", 'volume': str(rng.randint(100_000, 50_000_000))}
+
+
+def listing_csv(symbols):
+    lines = ['symbol,name,exchange,assetType,ipoDate,delistingDate,status']
+    lines.extend(f'{s},"{s} Corp, Inc",NYSE,Stock,2000-01-03,null,Active' for s in symbols)
+    return '\r\n'.join(lines) + '\r\n'
+
+
+class FakeAlphaVantage:
+    """Payload generation and throttling state shared by all handler threads"""
+
+    def __init__(self, weeks=520, symbols=10000, latency_ms=0, jitter_ms=0, rpm=0, throttle_rate=0.0, fixtures=None):
+        self.weeks = weeks
+        self.symbols = [symbol_name(i) for i in range(symbols)]
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rpm = rpm
+        self.throttle_rate = throttle_rate
+        self.fixtures = fixtures
+        self._recent = deque()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+
+    def throttle(self):
+        """True if this request should get a 429"""
+        now = time.monotonic()
+        with self._lock:
+            self.requests += 1
+            if self.throttle_rate and random.random() < self.throttle_rate:
+                self.throttled += 1
+                return True
+            if self.rpm:
+                while self._recent and now - self._recent[0] >= 60:
+                    self._recent.popleft()
+                if len(self._recent) >= self.rpm:
+                    self.throttled += 1
+                    return True
+                self._recent.append(now)
+        return False
+
+    def fixture(self, function, symbol):
+        if not self.fixtures:
+            return None
+        for name in (f"{function}_{symbol}.json", f"{function}.json", f"{function}.csv"):
+            path = os.path.join(self.fixtures, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    return f.read(), 'text/csv' if name.endswith('.csv') else 'application/json'
+        return None
+
+    def respond(self, params):
+        """(status, content type, body bytes) for a query"""
+        function = params.get('function', '')
+        symbol = params.get('symbol', '')
+        recorded = self.fixture(function, symbol)
+        if recorded:
+            return 200, recorded[1], recorded[0]
+        if function == 'OVERVIEW':
+            payload = overview(symbol)
+        elif function == 'TIME_SERIES_WEEKLY':
+            payload = weekly(symbol, self.weeks)
+        elif function == 'GLOBAL_QUOTE':
+            row = quote(symbol)
+            payload = {'Global Quote': {'01. symbol': symbol, '05. price': row['close'], '06. volume': row['volume']}}
+        elif function == 'REALTIME_BULK_QUOTES':
+            payload = {'data': [quote(s) for s in symbol.split(',') if s]}
+        elif function == 'TIME_SERIES_INTRADAY':
+            payload = {'Meta Data': {'2. Symbol': symbol}, 'Time Series (1min)': {}}
+        elif function == 'LISTING_STATUS':
+            return 200, 'text/csv', listing_csv(self.symbols).encode()
+        else:
+            payload = {'Error Message': f"Invalid API call: unknown function {function}"}
+        return 200, 'application/json', json.dumps(payload).encode()
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+            if fake.latency or fake.jitter:
+                time.sleep(fake.latency + random.uniform(0, fake.jitter))
+            if fake.throttle():
+                status, content_type = 429, 'application/json'
+                body = json.dumps({'Note': 'Thank you for using Alpha Vantage! Please slow down.'}).encode()
+            else:
+                status, content_type, body = fake.respond(params)
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def start(host='127.0.0.1', port=0, **options):
+    """Run a fake server on a background thread; returns (server, base_url, fake)"""
+    fake = FakeAlphaVantage(**options)
+    server = ThreadingHTTPServer((host, port), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fake-alpha-vantage', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/query", fake
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--weeks', type=int, default=520, help='weekly bars per symbol')
+    parser.add_argument('--symbols', type=int, default=10000, help='symbols in LISTING_STATUS')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--rpm', type=int, default=0, help='answer 429 above this many requests per minute (0: no limit)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='fraction of requests answered with 429')
+    parser.add_argument('--fixtures', help='directory of recorded payloads')
+    args = parser.parse_args()
+
+    server, url, _ = start(
+        args.host, args.port, weeks=args.weeks, symbols=args.symbols, latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms, rpm=args.rpm, throttle_rate=args.throttle_rate, fixtures=args.fixtures
+    )
+    print(f"Fake Alpha Vantage listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
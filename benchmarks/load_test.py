@@ -0,0 +1,104 @@
+"""Load-test the dashboard API and report latency percentiles and throughput.
+
+Each client thread keeps one keep-alive session and requests its endpoint
+in a loop for the given duration. Run against a server started with
+`python server.py` (gunicorn) or `python server.py --dev` to compare.
+
+Usage: python benchmarks/load_test.py [--url http://localhost:5001]
+       [--endpoints /api/stocks /api/watchlist /api/last-updated]
+       [--concurrency 16] [--duration 10] [--encoding br] [--etag]
+"""
+import argparse
+import statistics
+import threading
+import time
+
+import requests
+
+DEFAULT_ENDPOINTS = ['/api/stocks', '/api/watchlist', '/api/last-updated']
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return float('nan')
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+
+def client(url, args, deadline, results, lock):
+    session = requests.Session()
+    session.headers['Accept-Encoding'] = args.encoding
+    latencies, errors, received = [], 0, 0
+    etag = None
+    while time.perf_counter() < deadline:
+        headers = {'If-None-Match': etag} if args.etag and etag else None
+        start = time.perf_counter()
+        try:
+            response = session.get(url, headers=headers, timeout=30)
+            body = response.content
+        except requests.RequestException:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors += 1
+        # Bytes on the wire, i.e. before requests decompresses the body
+        received += int(response.headers.get('Content-Length', len(body)))
+        etag = response.headers.get('ETag', etag)
+    session.close()
+    with lock:
+        results['latencies'].extend(latencies)
+        results['errors'] += errors
+        results['bytes'] += received
+
+
+def run(base_url, endpoint, args):
+    results = {'latencies': [], 'errors': 0, 'bytes': 0}
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    threads = [
+        threading.Thread(target=client, args=(base_url + endpoint, args, deadline, results, lock))
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies = sorted(results['latencies'])
+    return {
+        'requests': len(latencies),
+        'errors': results['errors'],
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.50),
+        'p99': percentile(latencies, 0.99),
+        'mean': statistics.fmean(latencies) if latencies else float('nan'),
+        'avg_bytes': results['bytes'] / len(latencies) if latencies else 0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5001')
+    parser.add_argument('--endpoints', nargs='+', default=DEFAULT_ENDPOINTS)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10, help='seconds per endpoint')
+    parser.add_argument('--encoding', default='br, gzip', help="Accept-Encoding header ('identity' to disable)")
+    parser.add_argument('--etag', action='store_true', help='revalidate with If-None-Match (304 responses)')
+    args = parser.parse_args()
+
+    print(f"{args.concurrency} clients, {args.duration:g}s per endpoint, Accept-Encoding: {args.encoding}")
+    print(f"{'endpoint':<20} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'bytes':>9}")
+    print("-" * 76)
+    for endpoint in args.endpoints:
+        stats = run(args.url.rstrip('/'), endpoint, args)
+        print(
+            f"{endpoint:<20} {stats['requests']:>9} {stats['errors']:>7} {stats['rps']:>9.1f} "
+            f"{stats['p50'] * 1000:>8.1f} {stats['p99'] * 1000:>8.1f} {stats['avg_bytes']:>9.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""Aggregation operators the application uses that mongomock does not implement.
+
+install() patches mongomock in the current process only; production code
+keeps the real MongoDB expressions. Covered:
+
+- $convert to double/int/long with onError and onNull (dashboard market_cap)
+"""
+import mongomock.aggregate
+
+CONVERTERS = {'double': float, 'int': int, 'long': int}
+
+
+def _convert(parser, values):
+    try:
+        value = parser.parse(values['input'])
+    except KeyError:
+        value = None
+    if value is None:
+        return parser.parse(values['onNull']) if 'onNull' in values else None
+    try:
+        return CONVERTERS[values['to']](value)
+    except (TypeError, ValueError):
+        if 'onError' in values:
+            return parser.parse(values['onError'])
+        raise mongomock.OperationFailure(f"Failed to parse number '{value}' in $convert")
+
+
+def install():
+    parser_class = mongomock.aggregate._Parser
+    if getattr(parser_class, '_convert_installed', False):
+        return
+    original = parser_class._handle_type_convertion_operator
+
+    def handle(self, operator, values):
+        if operator == '$convert' and isinstance(values, dict) and values.get('to') in CONVERTERS:
+            return _convert(self, values)
+        return original(self, operator, values)
+
+    parser_class._handle_type_convertion_operator = handle
+    parser_class._convert_installed = True
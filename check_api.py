@@ -2,7 +2,7 @@ import requests
 import json
 
 try:
-    response = requests.get('http://localhost:5001/api/stocks')
+    response = requests.get('http://localhost:5001/api/graph')
     data = response.json()
     
     stock_nodes = [n for n in data['nodes'] if n['group'] == 'stock']
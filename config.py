@@ -1,4 +1,6 @@
 import os
+import tempfile
+from datetime import date
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -6,21 +8,118 @@ load_dotenv()
 
 # Database Configuration
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
-DB_NAME = 'stock_data'
+DB_NAME = os.getenv('DB_NAME', 'stock_data')
 DB_POOL_SIZE = 100
 DB_MAX_IDLE_TIME_MS = 10000
 DB_RETRY_WRITES = True
+DB_HEARTBEAT_FREQUENCY_MS = 10000
+BARS_COLLECTION = 'bars'
+BULK_WRITE_MAX_OPS = 1000  # flush a write batch at this many operations
+BULK_WRITE_MAX_DELAY = 5  # or when its oldest operation is this many seconds old
 
 # API Configuration
 ALPHA_VANTAGE_API_KEY = os.getenv('ALPHA_VANTAGE_API_KEY')
-ALPHA_VANTAGE_BASE_URL = 'https://www.alphavantage.co/query'
-MAX_REQUESTS_PER_MINUTE = 75
+ALPHA_VANTAGE_BASE_URL = os.getenv('ALPHA_VANTAGE_BASE_URL', 'https://www.alphavantage.co/query')
+MAX_REQUESTS_PER_MINUTE = int(os.getenv('MAX_REQUESTS_PER_MINUTE', '75'))
+VERIFY_API_ACCESS = os.getenv('VERIFY_API_ACCESS', 'true').lower() == 'true'  # test request at startup
 REQUEST_TIMEOUT = 10  # seconds
+BULK_QUOTE_BATCH_SIZE = 100  # REALTIME_BULK_QUOTES accepts up to 100 symbols
+
+# Rate Limiter Configuration
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory')  # memory, file or mongo
+# Requests allowed back to back. The burst counts against MAX_REQUESTS_PER_MINUTE:
+# each request above 1 lowers the steady rate by one per minute.
+RATE_LIMIT_BURST = int(os.getenv('RATE_LIMIT_BURST', '1'))
+RATE_LIMIT_STATE_FILE = os.getenv(
+    'RATE_LIMIT_STATE_FILE',
+    os.path.join(tempfile.gettempdir(), 'alpha_vantage_rate_limit.json')
+)
+
+# Response Cache Configuration
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'disk')  # none, disk or mongo
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'alpha_vantage'))
+CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '512'))  # in-memory LRU size
+CACHE_TTLS = {  # seconds; functions not listed are never cached
+    'OVERVIEW': 7 * 24 * 3600,        # fundamentals change quarterly
+    'TIME_SERIES_WEEKLY': 6 * 3600,   # the current week's bar moves daily
+    'LISTING_STATUS': 24 * 3600,      # listings change daily
+    'GLOBAL_QUOTE': 60
+}
 
 # Local API Configuration
 LOCAL_API_BASE_URL = 'http://localhost:5001'
 LOCAL_API_TIMEOUT = 5  # seconds
 
+# Dashboard Server Configuration
+SERVER_HOST = os.getenv('SERVER_HOST', '127.0.0.1')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '5001'))
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', str(2 * (os.cpu_count() or 1) + 1)))
+SERVER_WORKER_CLASS = os.getenv('SERVER_WORKER_CLASS', 'gthread')  # 'gevent' for many /api/stream clients
+SERVER_THREADS = int(os.getenv('SERVER_THREADS', '4'))  # threads per worker
+SERVER_KEEPALIVE = int(os.getenv('SERVER_KEEPALIVE', '5'))  # seconds an idle connection stays open
+SERVER_TIMEOUT = 30  # seconds before a stuck worker is restarted
+COMPRESS_ALGORITHMS = ['br', 'gzip']  # in order of preference
+COMPRESS_MIN_SIZE = 500  # bytes; smaller responses are sent as is
+
+# Live Update Stream Configuration
+STREAM_POLL_INTERVAL = 2  # seconds between polls when change streams are unavailable
+STREAM_POLL_OVERLAP = 2 * BULK_WRITE_MAX_DELAY  # seconds re-read per poll to catch late batched writes
+STREAM_HEARTBEAT = 15  # seconds between keep-alive comments on an idle stream
+
+# Logging Configuration
+LOG_FILE = os.getenv('LOG_FILE', 'stock_agent.log')  # agent log; the dashboard server logs to stderr
+SERVER_LOG_FILE = os.getenv('SERVER_LOG_FILE') or None
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json or text
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))  # rotate at this size
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))  # rotated files kept
+LOG_QUEUE_SIZE = 10000  # records buffered for the writer thread before new ones are dropped
+LOG_SAMPLE_WINDOW = 60  # seconds
+LOG_SAMPLE_BURST = 5  # sampled (verbose) records let through per key per window
+
+# Metrics Configuration
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9101'))  # agent's /metrics endpoint; 0 disables it
+METRICS_HOST = os.getenv('METRICS_HOST', SERVER_HOST)  # bind address; '0.0.0.0' exposes it to the network
+CYCLE_METRICS_COLLECTION = 'cycle_metrics'  # one summary record per refresh cycle
+
+# Snapshot Configuration
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshots'))
+
+# Backtest Configuration
+BACKTEST_WORKERS = int(os.getenv('BACKTEST_WORKERS', str(os.cpu_count() or 1)))  # processes for parameter sweeps
+BACKTEST_COST_BPS = 10  # trading cost per entry or exit, in basis points
+
+# Refresh Configuration
+REFRESH_WORKERS = int(os.getenv('REFRESH_WORKERS', '8'))  # symbols fetched concurrently
+
+# Ingestion Configuration
+INCREMENTAL_INGESTION = os.getenv('INCREMENTAL_INGESTION', 'true').lower() == 'true'
+MARKET_TIMEZONE = 'America/New_York'
+MARKET_OPEN_HOUR = 9
+MARKET_OPEN_MINUTE = 30
+MARKET_CLOSE_HOUR = 16  # weekly bars are final after the week's last close
+MARKET_EARLY_CLOSE_HOUR = 13  # day after Thanksgiving, July 3 and Christmas Eve
+MARKET_EXTRA_HOLIDAYS = [  # one-off closures, e.g. '2025-01-09'
+    date.fromisoformat(day.strip()) for day in os.getenv('MARKET_EXTRA_HOLIDAYS', '').split(',') if day.strip()
+]
+
+# Scheduler Configuration
+WEEKLY_DATA_DELAY_MINUTES = 60  # wait after the weekly close before the final bar is fetched
+FUNDAMENTALS_REFRESH_DAYS = int(os.getenv('FUNDAMENTALS_REFRESH_DAYS', '30'))  # OVERVIEW; also refreshes market cap
+QUOTE_REFRESH_MINUTES = int(os.getenv('QUOTE_REFRESH_MINUTES', '15'))  # bulk quotes while the market is open
+REFRESH_BATCH_SIZE = int(os.getenv('REFRESH_BATCH_SIZE', '100'))  # due symbols taken per scheduler pass
+REFRESH_RETRY_MINUTES = 15  # after a failed symbol refresh
+SCHEDULER_MAX_SLEEP = 3600  # seconds; upper bound so watchlist changes are picked up
+WATCHLIST_SIZE = 35  # top up the watchlist below this many stocks
+WATCHLIST_TOPUP_HOURS = 6  # at most this often
+
+# Symbol Universe Configuration
+UNIVERSE_REFRESH_HOURS = 24  # LISTING_STATUS changes daily
+
+# Screening Configuration
+SCREEN_MIN_MARKET_CAP = 2_000_000_000  # watchlist stocks must be above $2B
+SCREEN_MAX_PRICE = 100  # and trade below $100
+
 # Retry Configuration
 MAX_RETRIES = 3
 RETRY_DELAY = 1  # seconds
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import logging
+import threading
+from datetime import datetime
+from flask import Response, request
+
+SNAPSHOT_COLLECTION = 'dashboard'
+STOCK_TREE = 'stock_tree'
+STOCK_GRAPH = 'stock_graph'
+
+# Only the fields the dashboard payloads need
+STOCK_PROJECTION = {
+    '_id': 0, 'symbol': 1, 'sector': 1, 'industry': 1,
+    'market_cap': 1, 'latest_bar': 1, 'quote': 1, 'indicators': 1
+}
+
+
+def _label(field):
+    """Map missing or 'None' sector/industry values to 'Unknown' inside the pipeline"""
+    return {'$cond': [{'$in': [{'$ifNull': [field, 'None']}, ['None']]}, 'Unknown', field]}
+
+
+def stock_tree_pipeline():
+    """Aggregation that builds the sector -> industry -> stock tree in MongoDB
+
+    Only the fields the dashboard needs are projected, market_cap is
+    converted to a number (legacy string values included), price and
+    volume come from the bulk quote when present and otherwise from the
+    denormalized latest_bar, and grouping happens server-side, so the
+    application receives one small document per sector.
+    """
+    return [
+        {'$project': {
+            '_id': 0,
+            'name': '$symbol',
+            'type': {'$literal': 'stock'},
+            'market_cap': {'$convert': {'input': '$market_cap', 'to': 'double', 'onError': 0, 'onNull': 0}},
+            'price': {'$ifNull': ['$quote.price', {'$ifNull': ['$latest_bar.close', 0]}]},
+            'volume': {'$ifNull': ['$quote.volume', {'$ifNull': ['$latest_bar.volume', 0]}]},
+            'ao': {'$ifNull': ['$indicators.ao', 0]},
+            'ac': {'$ifNull': ['$indicators.ac', 0]},
+            'sector': _label('$sector'),
+            'industry': _label('$industry')
+        }},
+        {'$sort': {'sector': 1, 'industry': 1, 'name': 1}},
+        {'$group': {
+            '_id': {'sector': '$sector', 'industry': '$industry'},
+            'children': {'$push': '$$ROOT'}
+        }},
+        {'$sort': {'_id.sector': 1, '_id.industry': 1}},
+        {'$group': {
+            '_id': '$_id.sector',
+            'children': {'$push': {'name': '$_id.industry', 'type': 'industry', 'children': '$children'}}
+        }},
+        {'$sort': {'_id': 1}},
+        {'$project': {'_id': 0, 'name': '$_id', 'type': {'$literal': 'sector'}, 'children': 1}}
+    ]
+
+
+def build_stock_tree(db):
+    """Sector -> industry -> stock tree used by index.html"""
+    return list(db.stocks.aggregate(stock_tree_pipeline()))
+
+
+def stream_stock_tree(db):
+    """Yield the tree as JSON one sector at a time instead of materializing it"""
+    yield b'['
+    for i, sector in enumerate(db.stocks.aggregate(stock_tree_pipeline())):
+        yield (b',' if i else b'') + json.dumps(sector, separators=(',', ':')).encode()
+    yield b']'
+
+
+def build_stock_graph(db):
+    """Node/link graph served by server.py"""
+    sector_dict = {}
+    for stock in db.stocks.find({}, STOCK_PROJECTION):
+        industries = sector_dict.setdefault(stock.get('sector', 'Unknown'), {})
+        industries.setdefault(stock.get('industry', 'Unknown'), []).append(stock)
+
+    nodes = []
+    links = []
+    for sector, industries in sector_dict.items():
+        nodes.append({'id': f"sector_{sector}", 'name': sector, 'group': 'sector', 'value': 30})
+        for industry, members in industries.items():
+            industry_id = f"industry_{sector}_{industry}"
+            nodes.append({'id': industry_id, 'name': industry, 'group': 'industry', 'value': 20})
+            links.append({'source': f"sector_{sector}", 'target': industry_id, 'value': 2})
+            for stock in members:
+                latest_bar = stock.get('latest_bar')
+                if not latest_bar:
+                    logging.error(f"Error processing stock {stock['symbol']}: no price data")
+                    continue
+                quote = stock.get('quote') or {}
+                price = quote.get('price', latest_bar['close'])
+                volume = quote.get('volume', latest_bar['volume'])
+                indicators = stock.get('indicators') or {}
+                nodes.append({
+                    'id': stock['symbol'],
+                    'name': stock['symbol'],
+                    'group': 'stock',
+                    'value': 10,
+                    'price': f"${price:.2f}",
+                    'volume': f"{volume:,}",
+                    'ao': f"{indicators.get('ao') or 0:.2f}",
+                    'ac': f"{indicators.get('ac') or 0:.2f}"
+                })
+                links.append({'source': industry_id, 'target': stock['symbol'], 'value': 1})
+    return {'nodes': nodes, 'links': links}
+
+
+BUILDERS = {
+    STOCK_TREE: build_stock_tree,
+    STOCK_GRAPH: build_stock_graph
+}
+
+
+def serialize(payload):
+    """Serialize a payload and derive its ETag from the bytes"""
+    body = json.dumps(payload, separators=(',', ':')).encode()
+    return hashlib.sha1(body).hexdigest(), body
+
+
+def publish_dashboard(db):
+    """Rebuild every dashboard payload and store those whose content changed"""
+    changed = 0
+    for name, build in BUILDERS.items():
+        etag, body = serialize(build(db))
+        current = db[SNAPSHOT_COLLECTION].find_one({'_id': name}, {'etag': 1})
+        if current and current['etag'] == etag:
+            continue
+        db[SNAPSHOT_COLLECTION].replace_one(
+            {'_id': name},
+            {'_id': name, 'etag': etag, 'payload': body, 'updated_at': datetime.now().isoformat()},
+            upsert=True
+        )
+        changed += 1
+    logging.info(f"Published dashboard payloads ({changed} changed)")
+    return changed
+
+
+class SnapshotReader:
+    """Serves stored dashboard payloads with a per-process copy keyed by ETag
+
+    Each request reads only the small ETag field; the payload itself is
+    fetched again only after the agent has published a new version.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+        self._bodies = {}
+
+    def get(self, name):
+        """Return (etag, body) for a snapshot, or None if none was published"""
+        meta = self.db[SNAPSHOT_COLLECTION].find_one({'_id': name}, {'etag': 1})
+        if not meta:
+            return None
+        with self._lock:
+            cached = self._bodies.get(name)
+        if cached and cached[0] == meta['etag']:
+            return cached
+        doc = self.db[SNAPSHOT_COLLECTION].find_one({'_id': name}, {'etag': 1, 'payload': 1})
+        if not doc:
+            return None
+        cached = (doc['etag'], bytes(doc['payload']))
+        with self._lock:
+            self._bodies[name] = cached
+        return cached
+
+    def response(self, name):
+        """Flask response for a snapshot with ETag / If-None-Match (304) support"""
+        snapshot = self.get(name)
+        if snapshot is None:
+            # Nothing published yet, build from the live collection
+            if name == STOCK_TREE:
+                return Response(stream_stock_tree(self.db), mimetype='application/json')
+            snapshot = serialize(BUILDERS[name](self.db))
+        etag, body = snapshot
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
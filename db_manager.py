@@ -1,12 +1,176 @@
 import pymongo
-from pymongo.errors import ConnectionFailure, OperationFailure
+from pymongo import UpdateOne, monitoring
+from pymongo.errors import ConnectionFailure, OperationFailure, BulkWriteError
 import logging
+import os
+import threading
 import time
+from datetime import datetime
+from metrics import MongoCommandMetrics
+from bar_series import BarSeries
 from config import (
     MONGO_URI, DB_NAME, DB_POOL_SIZE, 
-    DB_MAX_IDLE_TIME_MS, MAX_RETRIES, RETRY_DELAY
+    DB_MAX_IDLE_TIME_MS, MAX_RETRIES, RETRY_DELAY,
+    BARS_COLLECTION, BULK_WRITE_MAX_OPS, BULK_WRITE_MAX_DELAY,
+    DB_HEARTBEAT_FREQUENCY_MS
 )
 
+def bar_operations(symbol, bars):
+    """Upsert operations for a symbol's bars (a BarSeries or date-keyed bar dict)"""
+    operations = []
+    for doc in BarSeries.coerce(bars).to_documents(symbol):
+        operations.append(UpdateOne(
+            {'symbol': symbol, 'timestamp': doc['timestamp']},
+            {'$set': doc},
+            upsert=True
+        ))
+    return operations
+
+class BulkWriter:
+    """Thread-safe write buffer that sends unordered bulk_write batches
+    
+    Operations are flushed once max_ops are queued or the oldest queued
+    operation is max_delay seconds old (checked whenever one is added), and
+    on flush() or leaving a with block.
+    """
+    
+    def __init__(self, collection, max_ops=BULK_WRITE_MAX_OPS, max_delay=BULK_WRITE_MAX_DELAY):
+        self.collection = collection
+        self.max_ops = max_ops
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._operations = []
+        self._first_queued = None
+        self.batches = 0
+        self.written = 0
+    
+    def add(self, *operations):
+        with self._lock:
+            if not self._operations:
+                self._first_queued = time.monotonic()
+            self._operations.extend(operations)
+            due = (
+                len(self._operations) >= self.max_ops
+                or time.monotonic() - self._first_queued >= self.max_delay
+            )
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """Send everything queued so far in one unordered bulk_write"""
+        with self._lock:
+            operations, self._operations = self._operations, []
+        if not operations:
+            return None
+        try:
+            result = self.collection.bulk_write(operations, ordered=False)
+        except BulkWriteError as e:
+            logging.error(f"Bulk write to {self.collection.name} failed for {len(e.details.get('writeErrors', []))} of {len(operations)} operations")
+            raise
+        with self._lock:
+            self.batches += 1
+            self.written += len(operations)
+        return result
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+class ConnectionStats(monitoring.ServerHeartbeatListener, monitoring.ConnectionPoolListener):
+    """Pool and heartbeat statistics collected from pymongo's monitoring events
+    
+    The driver's background monitor already heartbeats every server, so
+    health is tracked from those events instead of pinging before each use.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.connections_created = 0
+        self.pool_clears = 0
+        self.heartbeat_latency = None
+        self.heartbeat_failures = 0
+        self.last_heartbeat_ok = time.monotonic()
+    
+    # Heartbeats
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        with self._lock:
+            self.heartbeat_latency = event.duration
+            self.last_heartbeat_ok = time.monotonic()
+    
+    def failed(self, event):
+        with self._lock:
+            self.heartbeat_failures += 1
+        logging.warning(f"MongoDB heartbeat to {event.connection_id} failed: {event.reply}")
+    
+    # Connection pool
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_created += 1
+    
+    def connection_checked_out(self, event):
+        wait = getattr(event, 'duration', None) or 0.0
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.checkout_wait_total += wait
+            self.checkout_wait_max = max(self.checkout_wait_max, wait)
+    
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+    
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+    
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+    
+    # The remaining pool events carry nothing worth tracking
+    def pool_created(self, event):
+        pass
+    
+    def pool_ready(self, event):
+        pass
+    
+    def pool_closed(self, event):
+        pass
+    
+    def connection_ready(self, event):
+        pass
+    
+    def connection_closed(self, event):
+        pass
+    
+    def connection_check_out_started(self, event):
+        pass
+    
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checked_out': self.checked_out,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'checkout_wait_avg': self.checkout_wait_total / self.checkouts if self.checkouts else 0.0,
+                'checkout_wait_max': self.checkout_wait_max,
+                'connections_created': self.connections_created,
+                'pool_clears': self.pool_clears,
+                'heartbeat_latency': self.heartbeat_latency,
+                'heartbeat_failures': self.heartbeat_failures,
+                'seconds_since_heartbeat': time.monotonic() - self.last_heartbeat_ok
+            }
+
 class DatabaseManager:
     _instance = None
     
@@ -20,38 +184,183 @@ class DatabaseManager:
         """Initialize database connection with connection pooling"""
         self.client = None
         self.db = None
+        self.stats = None
+        self._pid = None
+        self._lock = threading.Lock()
         self.connect()
     
     def connect(self):
         """Establish database connection with retry logic"""
         for attempt in range(MAX_RETRIES):
+            stats = ConnectionStats()
+            client = pymongo.MongoClient(
+                MONGO_URI,
+                maxPoolSize=DB_POOL_SIZE,
+                maxIdleTimeMS=DB_MAX_IDLE_TIME_MS,
+                heartbeatFrequencyMS=DB_HEARTBEAT_FREQUENCY_MS,
+                event_listeners=[stats, MongoCommandMetrics()]
+            )
             try:
-                self.client = pymongo.MongoClient(
-                    MONGO_URI,
-                    maxPoolSize=DB_POOL_SIZE,
-                    maxIdleTimeMS=DB_MAX_IDLE_TIME_MS
-                )
-                # Test the connection
-                self.client.admin.command('ping')
-                self.db = self.client[DB_NAME]
-                logging.info("Successfully connected to MongoDB")
-                return
+                # Test the connection once; afterwards health comes from heartbeats
+                client.admin.command('ping')
             except (ConnectionFailure, OperationFailure) as e:
+                client.close()
                 if attempt == MAX_RETRIES - 1:
                     logging.error(f"Failed to connect to MongoDB after {MAX_RETRIES} attempts: {str(e)}")
                     raise
                 logging.warning(f"Connection attempt {attempt + 1} failed, retrying in {RETRY_DELAY} seconds...")
                 time.sleep(RETRY_DELAY)
+                continue
+            self.client = client
+            self.stats = stats
+            self.db = client[DB_NAME]
+            self._pid = os.getpid()
+            logging.info("Successfully connected to MongoDB")
+            return
     
     def get_database(self):
-        """Get database instance with connection check"""
-        try:
-            self.client.admin.command('ping')
-        except:
-            logging.warning("Lost connection to MongoDB, attempting to reconnect...")
-            self.connect()
+        """Get database instance
+        
+        No round-trip is made here. The client is rebuilt only in a forked
+        child (MongoClient is not fork-safe); the inherited client belongs to
+        the parent and is left open. Outages are recovered from by pymongo's
+        own monitor, so collections already handed out (the agent's db,
+        bulk writers, the scheduler) stay usable afterwards.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    logging.info("Process was forked, creating a new MongoDB client")
+                    self.connect()
         return self.db
     
+    def pool_stats(self):
+        """Connection pool and heartbeat statistics"""
+        return self.stats.snapshot() if self.stats else {}
+    
+    def ensure_bar_indexes(self):
+        """Create the (symbol, timestamp) index that every bar query uses"""
+        self.get_database()[BARS_COLLECTION].create_index(
+            [('symbol', pymongo.ASCENDING), ('timestamp', pymongo.ASCENDING)],
+            unique=True
+        )
+    
+    def ensure_indexes(self):
+        """Create every index the agent, dashboard API and stock queries rely on
+        
+        Safe to call on each startup; existing indexes are left as they are.
+        Each query sort key is paired with symbol, which is also the
+        pagination tiebreaker.
+        """
+        db = self.get_database()
+        self.ensure_bar_indexes()
+        db.stocks.create_index('symbol', unique=True)
+        db.stocks.create_index('last_update')
+        db.stocks.create_index([('sector', pymongo.ASCENDING), ('industry', pymongo.ASCENDING), ('symbol', pymongo.ASCENDING)])
+        db.stocks.create_index([('market_cap', pymongo.ASCENDING), ('symbol', pymongo.ASCENDING)])
+        db.stocks.create_index([('indicators.ao', pymongo.ASCENDING), ('symbol', pymongo.ASCENDING)])
+        db.stocks.create_index([('indicators.ac', pymongo.ASCENDING), ('symbol', pymongo.ASCENDING)])
+        db.watchlist.create_index('symbol', unique=True)
+    
+    def normalize_market_caps(self):
+        """Convert market caps stored as Alpha Vantage strings into numbers
+        
+        Unparseable values ('None', '-') become null. Safe to run repeatedly.
+        """
+        result = self.get_database().stocks.update_many(
+            {'market_cap': {'$type': 'string'}},
+            [{'$set': {'market_cap': {'$convert': {
+                'input': '$market_cap', 'to': 'double', 'onError': None, 'onNull': None
+            }}}}]
+        )
+        logging.info(f"Converted market cap to a number for {result.modified_count} stocks")
+        return result.modified_count
+    
+    def upsert_bars(self, symbol, bars):
+        """Insert or update bars for a symbol (a BarSeries or date-keyed bar dict)"""
+        if not bars:
+            return 0
+        operations = bar_operations(symbol, bars)
+        result = self.get_database()[BARS_COLLECTION].bulk_write(operations, ordered=False)
+        return result.upserted_count + result.modified_count
+    
+    def get_latest_bars(self, symbol, n):
+        """Return the latest n bars for a symbol as a BarSeries"""
+        cursor = self.get_database()[BARS_COLLECTION].find(
+            {'symbol': symbol}, {'_id': 0}
+        ).sort('timestamp', pymongo.DESCENDING).limit(n)
+        return BarSeries.from_documents(reversed(list(cursor)))
+    
+    def get_bars(self, symbol, start=None, end=None):
+        """Return a symbol's bars between two dates (inclusive) as a BarSeries
+        
+        Dates may be datetimes or 'YYYY-MM-DD' strings.
+        """
+        if isinstance(start, str):
+            start = datetime.strptime(start, '%Y-%m-%d')
+        if isinstance(end, str):
+            end = datetime.strptime(end, '%Y-%m-%d')
+        query = {'symbol': symbol}
+        if start or end:
+            query['timestamp'] = {}
+            if start:
+                query['timestamp']['$gte'] = start
+            if end:
+                query['timestamp']['$lte'] = end
+        cursor = self.get_database()[BARS_COLLECTION].find(
+            query, {'_id': 0}
+        ).sort('timestamp', pymongo.ASCENDING)
+        return BarSeries.from_documents(cursor)
+    
+    def migrate_embedded_bars(self):
+        """Move bars embedded in stocks.data into the bars collection
+        
+        Each stock document keeps only its latest bar afterwards. Safe to run
+        repeatedly; documents without embedded data are left alone.
+        """
+        db = self.get_database()
+        self.ensure_bar_indexes()
+        migrated = 0
+        for stock in db.stocks.find({'data': {'$exists': True}}, {'symbol': 1, 'data': 1}):
+            data = stock.get('data') or {}
+            self.upsert_bars(stock['symbol'], data)
+            update = {'$unset': {'data': ''}}
+            if data:
+                last_bar_date = max(data)
+                update['$set'] = {'last_bar_date': last_bar_date, 'latest_bar': data[last_bar_date]}
+            db.stocks.update_one({'_id': stock['_id']}, update)
+            migrated += 1
+            logging.info(f"Migrated {len(data)} bars for {stock['symbol']}")
+        logging.info(f"Migrated embedded bars for {migrated} stocks")
+        return migrated
+    
+    def bulk_writer(self, name, **kwargs):
+        """Write buffer for a collection; see BulkWriter"""
+        return BulkWriter(self.get_database()[name], **kwargs)
+    
+    def replace_collection(self, name, documents):
+        """Atomically replace a collection's contents
+        
+        Documents are written to a staging collection that is then renamed
+        over the target, so readers see either the old or the new contents
+        and never an empty collection. Indexes are copied to the staging
+        collection first.
+        """
+        db = self.get_database()
+        staging = db[f"{name}_staging"]
+        staging.drop()
+        for index in db[name].list_indexes():
+            if index['name'] != '_id_':
+                options = {k: v for k, v in index.items() if k not in ('key', 'v', 'ns')}
+                staging.create_index(list(index['key'].items()), **options)
+        if documents:
+            staging.insert_many(documents, ordered=False)
+        elif staging.name not in db.list_collection_names():
+            # rename needs the staging collection to exist
+            db.create_collection(staging.name)
+        staging.rename(name, dropTarget=True)
+        logging.info(f"Replaced {name} with {len(documents)} documents")
+    
     def close(self):
         """Close database connection"""
         if self.client:
@@ -0,0 +1,30 @@
+"""Gunicorn settings for the dashboard API (see server.py)"""
+import logging
+from config import (
+    SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_WORKER_CLASS, SERVER_THREADS,
+    SERVER_KEEPALIVE, SERVER_TIMEOUT
+)
+
+bind = f"{SERVER_HOST}:{SERVER_PORT}"
+workers = SERVER_WORKERS
+# Threaded workers keep idle HTTP/1.1 connections open between requests. Each
+# open /api/stream holds a thread, so switch to gevent for many live dashboards.
+worker_class = SERVER_WORKER_CLASS
+threads = SERVER_THREADS
+keepalive = SERVER_KEEPALIVE
+timeout = SERVER_TIMEOUT
+graceful_timeout = SERVER_TIMEOUT
+# Import the app once in the master; workers share its memory copy-on-write
+preload_app = True
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """Open this worker's own MongoDB connection pool before it takes requests"""
+    from server import dashboard_state
+    try:
+        dashboard_state()
+    except Exception as e:
+        # The first request retries the connection
+        logging.error(f"Worker {worker.pid} could not connect to MongoDB: {str(e)}")
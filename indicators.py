@@ -0,0 +1,155 @@
+import numpy as np
+from bar_series import BarSeries
+
+AO_FAST = 5
+AO_SLOW = 34
+AC_WINDOW = 5
+
+
+def bars_to_arrays(bars):
+    """Date strings plus the high/low columns of a BarSeries (or date-keyed bar dict)"""
+    bars = BarSeries.coerce(bars)
+    return bars.date_strings(), bars.high, bars.low
+
+
+def rolling_mean(values, window):
+    """Simple moving average along the last axis, NaN until the window is full
+
+    The window is summed by adding shifted views left to right, which is O(n)
+    for a fixed window and rounds exactly like ``sum(values[i:i + window])``.
+    Any NaN inside a window (e.g. padding) yields NaN for that position.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[-1]
+    out = np.full(values.shape, np.nan)
+    if n < window:
+        return out
+    total = values[..., 0:n - window + 1].copy()
+    for offset in range(1, window):
+        total += values[..., offset:n - window + 1 + offset]
+    out[..., window - 1:] = total / window
+    return out
+
+
+def awesome_oscillator(high, low, fast=AO_FAST, slow=AO_SLOW):
+    """AO = SMA5(median price) - SMA34(median price); other windows for backtests"""
+    median = (np.asarray(high, dtype=np.float64) + np.asarray(low, dtype=np.float64)) / 2
+    return rolling_mean(median, fast) - rolling_mean(median, slow)
+
+
+def acceleration_deceleration(ao, window=AC_WINDOW):
+    """AC = AO - SMA5(AO)"""
+    return ao - rolling_mean(ao, window)
+
+
+def compute_series(bars):
+    """Full AO/AC history for one symbol's bars"""
+    dates, high, low = bars_to_arrays(bars)
+    ao = awesome_oscillator(high, low)
+    return {'dates': dates, 'ao': ao, 'ac': acceleration_deceleration(ao)}
+
+
+def stack_columns(columns):
+    """Right-align 1-D arrays of different lengths into one NaN-padded 2-D array"""
+    width = max((len(c) for c in columns), default=0)
+    out = np.full((len(columns), width), np.nan)
+    for row, column in enumerate(columns):
+        if len(column):
+            out[row, width - len(column):] = column
+    return out
+
+
+def compute_batch(bar_sets):
+    """AO/AC for many symbols at once; bar_sets maps symbol to its BarSeries
+
+    Returns the symbols in row order plus 2-D AO and AC arrays whose last
+    column is every symbol's latest bar.
+    """
+    symbols = list(bar_sets)
+    highs, lows = [], []
+    for symbol in symbols:
+        _, high, low = bars_to_arrays(bar_sets[symbol])
+        highs.append(high)
+        lows.append(low)
+    ao = awesome_oscillator(stack_columns(highs), stack_columns(lows))
+    return symbols, ao, acceleration_deceleration(ao)
+
+
+def to_scalar(value):
+    """NaN-aware float conversion for storage and JSON"""
+    return None if np.isnan(value) else float(value)
+
+
+def series_to_records(series):
+    """Indicator history as a list of {date, ao, ac} dicts for charting"""
+    return [
+        {'date': date, 'ao': to_scalar(ao), 'ac': to_scalar(ac)}
+        for date, ao, ac in zip(series['dates'], series['ao'], series['ac'])
+        if not np.isnan(ao)
+    ]
+
+
+class IndicatorState:
+    """Constant-time AO/AC state for one symbol, updated one bar at a time
+
+    Keeps the last 34 median prices (enough for both SMA windows) and the
+    last 5 AO values. Window sums are taken over those fixed-size buffers on
+    each update, so results match compute_series exactly and never drift.
+    """
+
+    def __init__(self, last_date=None, medians=None, aos=None):
+        self.last_date = last_date
+        self.medians = list(medians or [])
+        self.aos = list(aos or [])
+
+    @classmethod
+    def from_bars(cls, bars):
+        """Build the state from a symbol's latest bars (full recompute)"""
+        state = cls()
+        bars = BarSeries.coerce(bars).tail(AO_SLOW + AC_WINDOW - 1)
+        for date, high, low in zip(bars.date_strings(), bars.high.tolist(), bars.low.tolist()):
+            state.update(date, high, low)
+        return state
+
+    @classmethod
+    def from_document(cls, doc):
+        if not doc:
+            return None
+        return cls(doc.get('last_date'), doc.get('medians'), doc.get('aos'))
+
+    def to_document(self):
+        return {'last_date': self.last_date, 'medians': self.medians, 'aos': self.aos}
+
+    def update(self, date, high, low):
+        """Apply a new bar, or a revision of the latest bar
+
+        Returns False for a bar older than the latest one, which means history
+        was corrected and the state has to be rebuilt with from_bars.
+        """
+        if self.last_date and date < self.last_date:
+            return False
+        median = (float(high) + float(low)) / 2
+        if date == self.last_date:
+            # Revised latest bar: drop its contribution before reapplying it
+            self.medians.pop()
+            if len(self.medians) >= AO_SLOW - 1:
+                self.aos.pop()
+        self.medians.append(median)
+        del self.medians[:-AO_SLOW]
+        if len(self.medians) == AO_SLOW:
+            sma_fast = sum(self.medians[-AO_FAST:]) / AO_FAST
+            sma_slow = sum(self.medians) / AO_SLOW
+            self.aos.append(sma_fast - sma_slow)
+            del self.aos[:-AC_WINDOW]
+        self.last_date = date
+        return True
+
+    @property
+    def ao(self):
+        return self.aos[-1] if len(self.medians) == AO_SLOW and self.aos else None
+
+    @property
+    def ac(self):
+        if len(self.aos) < AC_WINDOW:
+            return None
+        return self.aos[-1] - sum(self.aos) / AC_WINDOW
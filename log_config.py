@@ -0,0 +1,158 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from config import (
+    LOG_LEVEL, LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_QUEUE_SIZE,
+    LOG_SAMPLE_WINDOW, LOG_SAMPLE_BURST
+)
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with any extra= fields as top-level keys"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Let through at most LOG_SAMPLE_BURST records per sample_key per window
+
+    Only records logged with extra={'sample_key': ...} are sampled. The
+    first record let through after a window lists how many were dropped.
+    """
+
+    def __init__(self, window=LOG_SAMPLE_WINDOW, burst=LOG_SAMPLE_BURST):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, 'sample_key', None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            start, count, suppressed = self._windows.get(key, (now, 0, 0))
+            if now - start >= self.window:
+                start, count = now, 0
+            if count >= self.burst:
+                self._windows[key] = (start, count, suppressed + 1)
+                return False
+            self._windows[key] = (start, count + 1, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        """Resolve the message and traceback now, keeping them and extra= fields separate"""
+        record = copy.copy(record)
+        record.message = record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_exception_formatter = logging.Formatter()
+_state = {'listener': None, 'handler': None, 'filename': None}
+
+
+def _make_target(filename):
+    if filename:
+        handler = RotatingFileHandler(filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    else:
+        handler = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    return handler
+
+
+def _start_listener(queue_handler, filename):
+    """Give the handler a fresh queue and a writer thread draining it"""
+    queue_handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    listener = QueueListener(queue_handler.queue, _make_target(filename), respect_handler_level=True)
+    listener.start()
+    _state.update(listener=listener, handler=queue_handler, filename=filename)
+
+
+def _restart_in_child():
+    # The parent's writer thread does not exist after fork, and its queue
+    # lock may have been held mid-put, so the child starts over
+    if _state['handler'] is not None:
+        _start_listener(_state['handler'], _state['filename'])
+
+
+def _stop_listener():
+    """Flush queued records on exit"""
+    listener = _state['listener']
+    if listener is not None and listener._thread is not None:
+        listener.stop()
+
+
+atexit.register(_stop_listener)
+os.register_at_fork(after_in_child=_restart_in_child)
+
+
+def configure_logging(filename=None):
+    """Route the root logger through a queue to a background writer thread
+
+    Callers only pay for putting a record on a bounded queue (records are
+    dropped, never waited for, when it is full); formatting and file I/O
+    with rotation happen on the listener thread. filename None logs to
+    stderr.
+    """
+    _stop_listener()
+    queue_handler = NonBlockingQueueHandler(None)
+    queue_handler.addFilter(SamplingFilter())
+    _start_listener(queue_handler, filename)
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(LOG_LEVEL)
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(queue_handler)
+    return queue_handler
@@ -0,0 +1,160 @@
+"""NYSE trading calendar: sessions, holidays and early closes.
+
+Holidays are computed from the exchange's rules (observed on the nearest
+weekday, except New Year's Day falling on a Saturday, which is not made
+up), so no calendar data has to be shipped or kept up to date. One-off
+closures can be added with MARKET_EXTRA_HOLIDAYS.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+from config import (
+    MARKET_TIMEZONE, MARKET_OPEN_HOUR, MARKET_OPEN_MINUTE, MARKET_CLOSE_HOUR,
+    MARKET_EARLY_CLOSE_HOUR, MARKET_EXTRA_HOLIDAYS
+)
+
+MARKET_TZ = ZoneInfo(MARKET_TIMEZONE)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th weekday (0=Monday) of a month; n=-1 for the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    """Western Easter Sunday (anonymous Gregorian algorithm)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    j = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * j) // 451
+    month, day = divmod(h + j - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day):
+    """Saturday holidays move to Friday, Sunday holidays to Monday"""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=None)
+def holidays(year):
+    """{date: name} of full-day closures in a year"""
+    days = {
+        _nth_weekday(year, 1, 0, 3): "Martin Luther King Jr. Day",
+        _nth_weekday(year, 2, 0, 3): "Washington's Birthday",
+        _easter(year) - timedelta(days=2): "Good Friday",
+        _nth_weekday(year, 5, 0, -1): "Memorial Day",
+        _observed(date(year, 7, 4)): "Independence Day",
+        _nth_weekday(year, 9, 0, 1): "Labor Day",
+        _nth_weekday(year, 11, 3, 4): "Thanksgiving Day",
+        _observed(date(year, 12, 25)): "Christmas Day"
+    }
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        days[_observed(new_year)] = "New Year's Day"
+    if year >= 2022:
+        days[_observed(date(year, 6, 19))] = "Juneteenth"
+    for extra in MARKET_EXTRA_HOLIDAYS:
+        if extra.year == year:
+            days[extra] = "Special closure"
+    return days
+
+
+@lru_cache(maxsize=None)
+def early_closes(year):
+    """Days the market closes at MARKET_EARLY_CLOSE_HOUR"""
+    days = {_nth_weekday(year, 11, 3, 4) + timedelta(days=1)}  # day after Thanksgiving
+    for day in (date(year, 7, 3), date(year, 12, 24)):
+        if day.weekday() < 4:  # eve of a Tuesday-Friday holiday
+            days.add(day)
+    return days
+
+
+def is_trading_day(day):
+    return day.weekday() < 5 and day not in holidays(day.year)
+
+
+def session(day):
+    """(open, close) as aware datetimes for a trading day, else None"""
+    if not is_trading_day(day):
+        return None
+    close_hour = MARKET_EARLY_CLOSE_HOUR if day in early_closes(day.year) else MARKET_CLOSE_HOUR
+    return (
+        datetime.combine(day, time(MARKET_OPEN_HOUR, MARKET_OPEN_MINUTE), MARKET_TZ),
+        datetime.combine(day, time(close_hour), MARKET_TZ)
+    )
+
+
+def _local(now):
+    return (now or datetime.now(timezone.utc)).astimezone(MARKET_TZ)
+
+
+def is_open(now=None):
+    now = _local(now)
+    hours = session(now.date())
+    return hours is not None and hours[0] <= now < hours[1]
+
+
+def last_session_close(now=None):
+    """Most recent session close at or before now"""
+    now = _local(now)
+    day = now.date()
+    while True:
+        hours = session(day)
+        if hours and hours[1] <= now:
+            return hours[1]
+        day -= timedelta(days=1)
+
+
+def next_session_open(now=None):
+    """First session open after now"""
+    now = _local(now)
+    day = now.date()
+    while True:
+        hours = session(day)
+        if hours and hours[0] > now:
+            return hours[0]
+        day += timedelta(days=1)
+
+
+def week_close(day):
+    """Close of the last trading day in day's Monday-Friday week, or None"""
+    monday = day - timedelta(days=day.weekday())
+    for offset in range(4, -1, -1):
+        hours = session(monday + timedelta(days=offset))
+        if hours:
+            return hours[1]
+    return None
+
+
+def last_weekly_close(now=None):
+    """Most recent close that completed a weekly bar (usually Friday's)"""
+    now = _local(now)
+    day = now.date()
+    while True:
+        close = week_close(day)
+        if close and close <= now:
+            return close
+        day -= timedelta(days=7)
+
+
+def next_weekly_close(now=None):
+    """First close after now that will complete a weekly bar"""
+    now = _local(now)
+    day = now.date()
+    while True:
+        close = week_close(day)
+        if close and close > now:
+            return close
+        day += timedelta(days=7)
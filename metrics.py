@@ -0,0 +1,256 @@
+import errno
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pymongo import monitoring
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds; covers sub-millisecond MongoDB commands through multi-second API calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    return repr(float(value))
+
+
+class Metric:
+    """A named metric with a fixed set of labels, safe to update from any thread"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield self.name, key, (), value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            items = [(key, dict(state, counts=list(state['counts']))) for key, state in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['counts']):
+                cumulative += count
+                yield f"{self.name}_bucket", key, (('le', _format_value(bound)),), cumulative
+            yield f"{self.name}_bucket", key, (('le', '+Inf'),), state['count']
+            yield f"{self.name}_sum", key, (), state['sum']
+            yield f"{self.name}_count", key, (), state['count']
+
+
+class Registry:
+    """Process-wide collection of metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def exposition(self):
+        """All metrics in the Prometheus text format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(metric.labelnames, key, extra)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        """Counter values and histogram sums/counts as {sample name: {labels: value}}"""
+        values = {}
+        for metric in self._metrics.values():
+            for name, key, extra, value in metric.samples():
+                if extra:
+                    continue  # histogram buckets
+                label = ','.join(f"{n}={v}" for n, v in zip(metric.labelnames, key)) or 'total'
+                values.setdefault(name, {})[label] = value
+        return values
+
+
+def diff(before, after):
+    """What changed between two snapshots, leaving out anything that did not"""
+    changes = {}
+    for name, series in after.items():
+        for label, value in series.items():
+            delta = value - before.get(name, {}).get(label, 0)
+            if delta:
+                changes.setdefault(name, {})[label] = round(delta, 6)
+    return changes
+
+
+REGISTRY = Registry()
+
+# Alpha Vantage client
+API_REQUESTS = REGISTRY.counter(
+    'alpha_vantage_requests_total', 'Alpha Vantage HTTP requests by function and status', ('function', 'status'))
+API_LATENCY = REGISTRY.histogram(
+    'alpha_vantage_request_seconds', 'Alpha Vantage request latency, excluding rate limit waits', ('function',))
+API_RETRIES = REGISTRY.counter(
+    'alpha_vantage_retries_total', 'Alpha Vantage requests retried by the HTTP adapter', ('function',))
+API_CACHE_HITS = REGISTRY.counter(
+    'alpha_vantage_cache_hits_total', 'get_stock_data calls answered from the response cache', ('function',))
+RATE_LIMIT_WAIT = REGISTRY.histogram(
+    'rate_limit_wait_seconds', 'Time spent waiting on the rate limiter before a request')
+
+# MongoDB
+MONGO_COMMANDS = REGISTRY.histogram(
+    'mongodb_command_seconds', 'MongoDB command latency by command name', ('command',))
+MONGO_FAILURES = REGISTRY.counter(
+    'mongodb_command_failures_total', 'MongoDB commands that returned an error', ('command',))
+
+# Agent
+INDICATOR_LATENCY = REGISTRY.histogram(
+    'indicator_compute_seconds', 'AO/AC computation time (full history or incremental update)', ('mode',))
+CYCLE_LATENCY = REGISTRY.histogram(
+    'refresh_cycle_seconds', 'Wall time of a watchlist refresh cycle',
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 900, 1800))
+CYCLE_SYMBOLS = REGISTRY.counter(
+    'refresh_symbols_total', 'Symbols handled by refresh cycles by outcome', ('outcome',))
+
+# Dashboard server
+HTTP_REQUESTS = REGISTRY.counter(
+    'http_requests_total', 'Dashboard API requests by route, method and status', ('route', 'method', 'status'))
+HTTP_LATENCY = REGISTRY.histogram(
+    'http_request_seconds', 'Dashboard API handler latency by route', ('route',))
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command the client sends"""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMANDS.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event):
+        MONGO_COMMANDS.observe(event.duration_micros / 1e6, command=event.command_name)
+        MONGO_FAILURES.inc(command=event.command_name)
+
+
+def instrument_app(app):
+    """Count and time every Flask request by its URL rule"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        start = g.pop('metrics_start', None)
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        if start is not None:
+            HTTP_LATENCY.observe(time.perf_counter() - start, route=route)
+        HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+        return response
+
+    return app
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.exposition().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port, host='127.0.0.1'):
+    """Serve /metrics from a background thread (for processes without a web server)
+
+    Returns None, after a warning, when the port is taken (e.g. by a second
+    agent process), so metrics never stop the process from starting.
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        if e.errno != errno.EADDRINUSE:
+            raise
+        logging.warning(f"Metrics port {host}:{port} is already in use, not serving /metrics")
+        return None
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logging.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
@@ -0,0 +1,20 @@
+from db_manager import DatabaseManager
+import logging
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    db_manager = DatabaseManager()
+    
+    print("\nMigrating embedded bars to the bars collection...")
+    print("-" * 80)
+    migrated = db_manager.migrate_embedded_bars()
+    print("-" * 80)
+    print(f"Migrated {migrated} stocks")
+    
+    print("\nConverting market caps to numbers...")
+    converted = db_manager.normalize_market_caps()
+    print(f"Converted {converted} stocks")
+    db_manager.ensure_indexes()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pymongo import ReturnDocument
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from config import (
+    MAX_REQUESTS_PER_MINUTE, RATE_LIMIT_BACKEND,
+    RATE_LIMIT_BURST, RATE_LIMIT_STATE_FILE
+)
+
+
+class MemoryStateStore:
+    """Limiter state kept in this process only"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tat = 0.0
+
+    def reserve(self, now, interval):
+        """Atomically reserve the next slot and return the new theoretical arrival time"""
+        with self._lock:
+            self._tat = max(self._tat, now) + interval
+            return self._tat
+
+    def peek(self):
+        return self._tat
+
+
+class FileStateStore:
+    """Limiter state kept in a locked file shared by every process on the host"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _locked(self, handle):
+        if fcntl:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock(self, handle):
+        if fcntl:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _read(self, handle):
+        handle.seek(0)
+        try:
+            return float(json.loads(handle.read() or '{}').get('tat', 0.0))
+        except ValueError:
+            return 0.0
+
+    def reserve(self, now, interval):
+        if not os.path.exists(self.path):
+            open(self.path, 'a').close()
+        with self._lock, open(self.path, 'r+') as handle:
+            self._locked(handle)
+            try:
+                tat = max(self._read(handle), now) + interval
+                handle.seek(0)
+                handle.truncate()
+                handle.write(json.dumps({'tat': tat}))
+                handle.flush()
+                return tat
+            finally:
+                self._unlock(handle)
+
+    def peek(self):
+        if not os.path.exists(self.path):
+            return 0.0
+        with open(self.path, 'r') as handle:
+            return self._read(handle)
+
+
+class MongoStateStore:
+    """Limiter state kept in MongoDB so processes on different hosts share one budget"""
+
+    def __init__(self, collection, key='alpha_vantage'):
+        self.collection = collection
+        self.key = key
+
+    def reserve(self, now, interval):
+        # Single pipeline update keeps the read-modify-write atomic on the server
+        doc = self.collection.find_one_and_update(
+            {'_id': self.key},
+            [{'$set': {'tat': {'$add': [{'$max': [{'$ifNull': ['$tat', 0]}, now]}, interval]}}}],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc['tat']
+
+    def peek(self):
+        doc = self.collection.find_one({'_id': self.key})
+        return doc['tat'] if doc else 0.0
+
+
+class RateLimiter:
+    """Smooth rate limiter based on GCRA (an equivalent form of a token bucket)
+
+    Every call reserves the next free slot, so concurrent callers are spaced
+    evenly after an initial burst of ``burst`` requests, instead of firing
+    the whole minute's quota at once.
+
+    The burst is part of the per-minute quota: GCRA lets ``burst - 1``
+    requests through on top of the steady rate in any window, so slots are
+    ``60 / (requests_per_minute - burst + 1)`` seconds apart and no 60 s
+    window ever holds more than ``requests_per_minute`` requests. With
+    ``burst=1`` the steady rate is the full quota.
+    """
+
+    def __init__(self, requests_per_minute=MAX_REQUESTS_PER_MINUTE, burst=RATE_LIMIT_BURST, store=None):
+        self.burst = min(max(1, burst), requests_per_minute)
+        self.interval = 60.0 / (requests_per_minute - self.burst + 1)
+        self.store = store or MemoryStateStore()
+        self._stats_lock = threading.Lock()
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.last_wait = 0.0
+
+    @classmethod
+    def from_config(cls):
+        """Build the limiter with the state backend selected in config"""
+        if RATE_LIMIT_BACKEND == 'file':
+            store = FileStateStore(RATE_LIMIT_STATE_FILE)
+        elif RATE_LIMIT_BACKEND == 'mongo':
+            from db_manager import DatabaseManager
+            store = MongoStateStore(DatabaseManager().get_database().rate_limits)
+        else:
+            store = MemoryStateStore()
+        logging.info(f"Rate limiter using {RATE_LIMIT_BACKEND} state backend")
+        return cls(store=store)
+
+    def _reserve(self):
+        """Reserve a slot and return how long the caller must wait for it"""
+        now = time.time()
+        tat = self.store.reserve(now, self.interval)
+        return max(0.0, tat - now - self.burst * self.interval)
+
+    def _record(self, wait):
+        with self._stats_lock:
+            self.acquired += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.last_wait = wait
+
+    def acquire(self):
+        """Block until a request may be sent; returns the time waited in seconds"""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+        self._record(wait)
+        return wait
+
+    async def acquire_async(self):
+        """Async variant of acquire that never blocks the event loop"""
+        loop = asyncio.get_running_loop()
+        wait = await loop.run_in_executor(None, self._reserve)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._record(wait)
+        return wait
+
+    def tokens_available(self):
+        """Number of requests that could be sent right now without waiting"""
+        backlog = max(0.0, self.store.peek() - time.time())
+        return max(0, int((self.burst * self.interval - backlog) // self.interval))
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'tokens_available': self.tokens_available(),
+                'acquired': self.acquired,
+                'total_wait': self.total_wait,
+                'max_wait': self.max_wait,
+                'last_wait': self.last_wait
+            }
@@ -0,0 +1,187 @@
+import heapq
+import logging
+from datetime import datetime, timedelta, timezone
+import market_calendar
+from config import (
+    WEEKLY_DATA_DELAY_MINUTES, FUNDAMENTALS_REFRESH_DAYS, QUOTE_REFRESH_MINUTES,
+    REFRESH_RETRY_MINUTES, SCHEDULER_MAX_SLEEP, WATCHLIST_SIZE, WATCHLIST_TOPUP_HOURS
+)
+
+WEEKLY_DATA_DELAY = timedelta(minutes=WEEKLY_DATA_DELAY_MINUTES)
+FUNDAMENTALS_MAX_AGE = timedelta(days=FUNDAMENTALS_REFRESH_DAYS)
+WATCHLIST_TOPUP_INTERVAL = timedelta(hours=WATCHLIST_TOPUP_HOURS)
+SCHEDULE_PROJECTION = {'_id': 0, 'symbol': 1, 'last_bar_date': 1, 'last_fetch': 1, 'fundamentals_fetch': 1}
+
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
+def in_session(due, now):
+    """Earliest time at or after due (and now) that the market is open"""
+    due = max(due, now)
+    return due if market_calendar.is_open(due) else market_calendar.next_session_open(due)
+
+
+def weekly_data_published(now=None):
+    """When the latest final weekly bar became available to fetch"""
+    now = now or _utcnow()
+    return market_calendar.last_weekly_close(now - WEEKLY_DATA_DELAY) + WEEKLY_DATA_DELAY
+
+
+def next_weekly_data(after):
+    """When the first final weekly bar after a fetch at after becomes available"""
+    return market_calendar.next_weekly_close(after - WEEKLY_DATA_DELAY) + WEEKLY_DATA_DELAY
+
+
+def weekly_stale(stored, now=None):
+    """True if a weekly bar has been finalized since the symbol's last fetch"""
+    if not stored or not stored.get('last_fetch'):
+        return True
+    return datetime.fromisoformat(stored['last_fetch']) < weekly_data_published(now)
+
+
+def fundamentals_due(stored, now=None):
+    """When a symbol's OVERVIEW should next be fetched
+
+    FUNDAMENTALS_REFRESH_DAYS after the last fetch, moved to the next session
+    open when that (or now, if overdue) falls outside market hours. Stocks
+    stored before fundamentals_fetch was recorded count from their last fetch.
+    """
+    fetched = stored.get('fundamentals_fetch') or stored.get('last_fetch')
+    if not fetched:
+        return None
+    return in_session(datetime.fromisoformat(fetched) + FUNDAMENTALS_MAX_AGE, now or _utcnow())
+
+
+def next_refresh(stored, now=None):
+    """Earliest time any of a symbol's data can have changed"""
+    now = now or _utcnow()
+    if not stored or not stored.get('last_bar_date') or not stored.get('last_fetch'):
+        return now
+    weekly = next_weekly_data(datetime.fromisoformat(stored['last_fetch']))
+    return min(weekly, fundamentals_due(stored, now))
+
+
+class RefreshScheduler:
+    """Priority queue of watchlist symbols ordered by when they go stale
+
+    A symbol is due once a new weekly bar has been finalized since its last
+    fetch (the week's last session close per market_calendar, plus
+    WEEKLY_DATA_DELAY_MINUTES) or its fundamentals are older than
+    FUNDAMENTALS_REFRESH_DAYS (at the next session open). Quotes are
+    refreshed every QUOTE_REFRESH_MINUTES while the market is open and once
+    after each close, and a short watchlist is topped up at most every
+    WATCHLIST_TOPUP_HOURS during market hours. Nothing else is due, so
+    nights, weekends and holidays cost no requests beyond the weekly fetch.
+
+    Entries are replaced by pushing a newer due time; stale heap entries
+    are skipped when popped.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._heap = []
+        self._due = {}
+        self.last_quotes = None
+        self.quotes_retry_at = None
+        self.last_topup = None
+        self.watchlist_full = False
+
+    def __len__(self):
+        return len(self._due)
+
+    def schedule(self, symbol, due):
+        self._due[symbol] = due
+        heapq.heappush(self._heap, (due, symbol))
+
+    def _stored(self, symbols):
+        return {
+            doc['symbol']: doc
+            for doc in self.db.stocks.find({'symbol': {'$in': list(symbols)}}, SCHEDULE_PROJECTION)
+        }
+
+    def sync_watchlist(self, now=None):
+        """Schedule symbols added to the watchlist and forget removed ones"""
+        now = now or _utcnow()
+        watchlist = {doc['symbol'] for doc in self.db.watchlist.find({}, {'symbol': 1})}
+        self.watchlist_full = len(watchlist) >= WATCHLIST_SIZE
+        for symbol in set(self._due) - watchlist:
+            del self._due[symbol]
+        added = watchlist - set(self._due)
+        if added:
+            stored = self._stored(added)
+            for symbol in added:
+                self.schedule(symbol, next_refresh(stored.get(symbol), now))
+            logging.info(f"Scheduled {len(added)} symbols, {len(self._due)} on the watchlist")
+        return len(added)
+
+    def pop_due(self, now=None, limit=None):
+        """Symbols due by now, most overdue first"""
+        now = now or _utcnow()
+        symbols = []
+        while self._heap and self._heap[0][0] <= now and (limit is None or len(symbols) < limit):
+            due, symbol = heapq.heappop(self._heap)
+            if self._due.get(symbol) == due:
+                del self._due[symbol]
+                symbols.append(symbol)
+        return symbols
+
+    def reschedule(self, symbols, failed=(), now=None):
+        """Queue refreshed symbols again from their stored fetch times"""
+        now = now or _utcnow()
+        stored = self._stored(symbols)
+        failed = set(failed)
+        retry = now + timedelta(minutes=REFRESH_RETRY_MINUTES)
+        for symbol in symbols:
+            due = retry if symbol in failed else next_refresh(stored.get(symbol), now)
+            # Never schedule into the past, which would refresh it again at once
+            self.schedule(symbol, due if due > now else retry)
+
+    def retry_quotes(self, now=None):
+        """Try a failed quote refresh again after REFRESH_RETRY_MINUTES"""
+        self.quotes_retry_at = (now or _utcnow()) + timedelta(minutes=REFRESH_RETRY_MINUTES)
+
+    def quotes_due_at(self, now=None):
+        """When the next bulk quote refresh is due
+
+        last_quotes is only set by a refresh without failed batches, so a
+        failed one stays due and is retried at quotes_retry_at.
+        """
+        now = now or _utcnow()
+        due = self._quotes_due(now)
+        if self.quotes_retry_at is not None:
+            due = max(due, self.quotes_retry_at)
+        return due
+
+    def _quotes_due(self, now):
+        if self.last_quotes is None:
+            return now
+        close = market_calendar.last_session_close(now)
+        if self.last_quotes < close:
+            return close
+        if market_calendar.is_open(now):
+            return self.last_quotes + timedelta(minutes=QUOTE_REFRESH_MINUTES)
+        return market_calendar.next_session_open(now)
+
+    def topup_due_at(self, now=None):
+        """When the watchlist may next be topped up (None while it is full)"""
+        now = now or _utcnow()
+        if self.watchlist_full:
+            return None
+        if self.last_topup is None:
+            return in_session(now, now)
+        return in_session(self.last_topup + WATCHLIST_TOPUP_INTERVAL, now)
+
+    def next_wakeup(self, now=None):
+        """When the agent has something to do next (bounded by SCHEDULER_MAX_SLEEP)"""
+        now = now or _utcnow()
+        candidates = [now + timedelta(seconds=SCHEDULER_MAX_SLEEP), self.quotes_due_at(now)]
+        topup = self.topup_due_at(now)
+        if topup is not None:
+            candidates.append(topup)
+        while self._heap and self._due.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if self._heap:
+            candidates.append(self._heap[0][0])
+        return min(candidates)
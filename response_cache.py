@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from time_series import loads, dumps
+from refresh_scheduler import next_weekly_data
+from config import (
+    CACHE_BACKEND, CACHE_DIR, CACHE_MAX_ENTRIES, CACHE_TTLS
+)
+
+
+def weekly_expiry(fetched_at):
+    """A weekly payload is stale once the next weekly bar has been published"""
+    return next_weekly_data(datetime.fromtimestamp(fetched_at, timezone.utc)).timestamp()
+
+
+# Latest expiry per function regardless of its TTL, as a function of fetch time
+CACHE_EXPIRY_LIMITS = {'TIME_SERIES_WEEKLY': weekly_expiry}
+
+
+def is_cacheable(value):
+    """Only keep real payloads, never rate-limit notes or error messages"""
+    if isinstance(value, dict):
+        return bool(value) and not any(k in value for k in ('Note', 'Information', 'Error Message'))
+    return bool(value)
+
+
+class DiskCacheBackend:
+    """One JSON file per cached response"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.json')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                entry = loads(f.read())
+        except (OSError, ValueError):
+            return None
+        if entry['expires_at'] <= time.time():
+            return None
+        return entry['expires_at'], entry['value']
+
+    def set(self, key, expires_at, value):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(dumps({'key': key, 'expires_at': expires_at, 'value': value}))
+        os.replace(tmp_path, path)
+
+
+class MongoCacheBackend:
+    """Cached responses in a MongoDB collection expired by a TTL index"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.collection.create_index('expires_at', expireAfterSeconds=0)
+
+    def get(self, key):
+        doc = self.collection.find_one({'_id': key})
+        if not doc:
+            return None
+        expires_at = doc['expires_at'].replace(tzinfo=timezone.utc).timestamp()
+        if expires_at <= time.time():
+            return None
+        return expires_at, loads(doc['value'])
+
+    def set(self, key, expires_at, value):
+        # Payload keys such as '1. open' contain dots, so store the JSON text
+        self.collection.replace_one(
+            {'_id': key},
+            {
+                '_id': key,
+                'value': dumps(value),
+                'expires_at': datetime.fromtimestamp(expires_at, tz=timezone.utc)
+            },
+            upsert=True
+        )
+
+
+class ResponseCache:
+    """Read-through cache for Alpha Vantage responses
+
+    Entries are keyed on (function, symbol, extra params) and expire after the
+    TTL configured for their function, or earlier where CACHE_EXPIRY_LIMITS
+    says the data will have changed (weekly bars at the next weekly close).
+    An LRU dict sits in front of an optional persistent backend shared
+    between runs and processes.
+    """
+
+    def __init__(self, ttls=CACHE_TTLS, max_entries=CACHE_MAX_ENTRIES, backend=None,
+                 expiry_limits=CACHE_EXPIRY_LIMITS):
+        self.ttls = ttls
+        self.expiry_limits = expiry_limits
+        self.max_entries = max_entries
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_hits = 0
+
+    @classmethod
+    def from_config(cls):
+        """Build the cache with the persistent backend selected in config"""
+        if CACHE_BACKEND == 'disk':
+            backend = DiskCacheBackend(CACHE_DIR)
+        elif CACHE_BACKEND == 'mongo':
+            from db_manager import DatabaseManager
+            backend = MongoCacheBackend(DatabaseManager().get_database().api_cache)
+        else:
+            backend = None
+        logging.info(f"Response cache using {CACHE_BACKEND} backend")
+        return cls(backend=backend)
+
+    @staticmethod
+    def make_key(function, symbol=None, params=None):
+        extra = '&'.join(f"{k}={v}" for k, v in sorted((params or {}).items()))
+        return f"{function}:{symbol or ''}:{extra}"
+
+    def ttl(self, function):
+        return self.ttls.get(function, 0)
+
+    def get(self, function, symbol=None, params=None):
+        """Return the cached payload or None"""
+        if not self.ttl(function):
+            return None
+        key = self.make_key(function, symbol, params)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+        entry = self.backend.get(key) if self.backend else None
+        with self._lock:
+            if entry:
+                self.hits += 1
+                self.backend_hits += 1
+                self._store(key, *entry)
+                return entry[1]
+            self.misses += 1
+        return None
+
+    def set(self, function, symbol, value, params=None):
+        """Cache a payload if its function has a TTL and it is not an error"""
+        ttl = self.ttl(function)
+        if not ttl or not is_cacheable(value):
+            return
+        key = self.make_key(function, symbol, params)
+        now = time.time()
+        expires_at = now + ttl
+        if function in self.expiry_limits:
+            expires_at = min(expires_at, self.expiry_limits[function](now))
+        with self._lock:
+            self._store(key, expires_at, value)
+        if self.backend:
+            try:
+                self.backend.set(key, expires_at, value)
+            except Exception as e:
+                logging.warning(f"Could not persist cache entry {key}: {str(e)}")
+
+    def _store(self, key, expires_at, value):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'backend_hits': self.backend_hits,
+                'hit_rate': self.hits / total if total else 0.0,
+                'entries': len(self._entries)
+            }
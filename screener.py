@@ -0,0 +1,144 @@
+import logging
+from config import SCREEN_MIN_MARKET_CAP, SCREEN_MAX_PRICE, BULK_QUOTE_BATCH_SIZE
+
+
+def to_float(value):
+    """Parse an Alpha Vantage numeric string, treating 'None' and blanks as 0"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class CandidateScreener:
+    """Staged watchlist screener that stops at the first failing check
+
+    Stages run cheapest and most selective first: market cap (OVERVIEW,
+    usually a cache hit and rejects most of the listing), then price
+    (GLOBAL_QUOTE), then weekly history (TIME_SERIES_WEEKLY, the largest
+    payload and one the refresh cycle reuses from the cache). Market caps
+    are remembered in the symbol universe so known small caps are never
+    sampled again.
+    
+    When the bulk quote endpoint is available, prices for a whole batch of
+    candidates are fetched in one request and the now free price check
+    runs first.
+    """
+
+    def __init__(self, api_manager, universe=None):
+        self.api_manager = api_manager
+        self.universe = universe
+        self.stages = [
+            ('market_cap', self.check_market_cap),
+            ('price', self.check_price),
+            ('history', self.check_history)
+        ]
+        self.quotes = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {name: {'evaluated': 0, 'rejected': 0} for name, _ in self.stages}
+        self.stats['errors'] = 0
+
+    def check_market_cap(self, symbol, facts):
+        overview = self.api_manager.get_stock_data(symbol=symbol, function='OVERVIEW')
+        market_cap = to_float(overview.get('MarketCapitalization'))
+        facts['market_cap'] = market_cap
+        if self.universe is not None:
+            self.universe.remember(symbol, market_cap=market_cap)
+        if market_cap <= SCREEN_MIN_MARKET_CAP:
+            return False, f"Market cap too low: ${market_cap:,.2f}"
+        return True, None
+
+    def check_price(self, symbol, facts):
+        if symbol in self.quotes:
+            price = self.quotes[symbol]['price']
+        else:
+            quote = self.api_manager.get_stock_data(symbol=symbol, function='GLOBAL_QUOTE')
+            price = to_float(quote.get('Global Quote', {}).get('05. price'))
+        facts['price'] = price
+        if price >= SCREEN_MAX_PRICE:
+            return False, f"Price too high: ${price:.2f}"
+        return True, None
+
+    def check_history(self, symbol, facts):
+        weekly = self.api_manager.get_stock_data(symbol=symbol, function='TIME_SERIES_WEEKLY')
+        time_series = weekly.get('Weekly Time Series', {})
+        if not time_series:
+            return False, "No historical data"
+        facts['data_since'] = min(time_series)
+        return True, None
+
+    def evaluate(self, symbol):
+        """Run the stages for one symbol; returns (passed, reason, facts)"""
+        facts = {}
+        stages = self.stages
+        if symbol in self.quotes:
+            # Price is already known, so that check costs nothing
+            stages = sorted(stages, key=lambda stage: stage[0] != 'price')
+        for name, check in stages:
+            self.stats[name]['evaluated'] += 1
+            passed, reason = check(symbol, facts)
+            if not passed:
+                self.stats[name]['rejected'] += 1
+                return False, reason, facts
+        reason = (
+            f"Valid - Market Cap: ${facts['market_cap']:,.2f}, Price: ${facts['price']:.2f}, "
+            f"Data since: {facts['data_since']}"
+        )
+        return True, reason, facts
+
+    def screen(self, candidates, limit):
+        """Accept candidates until limit pass every stage; returns the accepted stocks"""
+        self.reset_stats()
+        self.quotes = {}
+        requests_before = self.api_manager.rate_limiter.acquired
+        selected = []
+        for stock in self._prefetch_quotes(candidates):
+            if len(selected) >= limit:
+                break
+            try:
+                passed, reason, _ = self.evaluate(stock['symbol'])
+            except Exception as e:
+                self.stats['errors'] += 1
+                logging.warning(f"Error checking {stock['symbol']}: {str(e)}")
+                continue
+            if passed:
+                selected.append(stock)
+                logging.info(f"Selected {stock['symbol']} - {reason}")
+            else:
+                logging.info(f"Skipped {stock['symbol']} - {reason}")
+        self.report(selected, self.api_manager.rate_limiter.acquired - requests_before)
+        return selected
+
+    def _prefetch_quotes(self, candidates):
+        """Pass candidates through, bulk-fetching quotes one batch ahead"""
+        batch = []
+        for stock in candidates:
+            batch.append(stock)
+            if len(batch) >= BULK_QUOTE_BATCH_SIZE:
+                yield from self._with_quotes(batch)
+                batch = []
+        if batch:
+            yield from self._with_quotes(batch)
+
+    def _with_quotes(self, batch):
+        if self.api_manager.bulk_quotes_supported is not False:
+            self.quotes.update(self.api_manager.get_bulk_quotes(
+                [stock['symbol'] for stock in batch], fallback=False
+            ))
+        return batch
+
+    def report(self, selected, api_calls):
+        self.stats['accepted'] = len(selected)
+        self.stats['api_calls'] = api_calls
+        self.stats['calls_per_accepted'] = api_calls / len(selected) if selected else None
+        stages = ', '.join(
+            f"{name} {self.stats[name]['rejected']}/{self.stats[name]['evaluated']} rejected"
+            for name, _ in self.stages
+        )
+        per_accepted = f"{self.stats['calls_per_accepted']:.1f}" if selected else 'n/a'
+        logging.info(
+            f"Screening accepted {len(selected)} stocks using {api_calls} API calls "
+            f"({per_accepted} per accepted; {stages})"
+        )
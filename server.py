@@ -1,124 +1,187 @@
-from flask import Flask, jsonify, send_from_directory
+"""Dashboard API
+
+Production: gunicorn -c gunicorn.conf.py "server:create_app()"
+            (or simply: python server.py)
+Development: python server.py --dev
+"""
+from flask import Flask, Response, jsonify, request, send_from_directory
+from flask_compress import Compress
 from flask_cors import CORS
+import argparse
 import logging
+import os
+import threading
 from db_manager import DatabaseManager
-from datetime import datetime
+from dashboard_cache import SnapshotReader, STOCK_TREE, STOCK_GRAPH
+from stock_stream import ChangeBroadcaster, event_stream
+from stock_query import query_stocks
+import indicators
+import metrics
 import traceback
-
-# Set up logging
-logging.basicConfig(
-    filename='server.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+from log_config import configure_logging
+from config import (
+    SERVER_HOST, SERVER_PORT, SERVER_LOG_FILE, COMPRESS_ALGORITHMS, COMPRESS_MIN_SIZE
 )
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for all routes
+# Log through the background writer; stderr is collected by gunicorn
+configure_logging(SERVER_LOG_FILE)
 
-# Initialize database connection
-db_manager = DatabaseManager()
-db = db_manager.get_database()
+STATIC_DIR = os.path.dirname(os.path.abspath(__file__))
 
-@app.route('/')
-def index():
-    try:
-        return send_from_directory('.', 'index.html')
-    except Exception as e:
-        logging.error(f"Error serving index.html: {str(e)}")
-        return jsonify({'error': 'Failed to load page'}), 500
+_state = {}
+_state_lock = threading.Lock()
 
-@app.route('/api/stocks')
-def get_stocks():
-    try:
-        stocks = list(db['stocks'].find())
-        nodes = []
-        links = []
-        sector_dict = {}
-        
-        # First pass: organize stocks by sector and industry
-        for stock in stocks:
-            sector = stock.get('sector', 'Unknown')
-            industry = stock.get('industry', 'Unknown')
-            
-            if sector not in sector_dict:
-                sector_dict[sector] = {'industries': {}}
-                
-            if industry not in sector_dict[sector]['industries']:
-                sector_dict[sector]['industries'][industry] = []
-                
-            sector_dict[sector]['industries'][industry].append(stock)
-
-        # Second pass: create nodes and links
-        # Add sector nodes first
-        for sector in sector_dict:
-            nodes.append({
-                'id': f"sector_{sector}",
-                'name': sector,
-                'group': 'sector',
-                'value': 30
-            })
-            
-            # Add industry nodes for this sector
-            for industry in sector_dict[sector]['industries']:
-                industry_id = f"industry_{sector}_{industry}"
-                nodes.append({
-                    'id': industry_id,
-                    'name': industry,
-                    'group': 'industry',
-                    'value': 20
-                })
-                # Link industry to sector
-                links.append({
-                    'source': f"sector_{sector}",
-                    'target': industry_id,
-                    'value': 2
-                })
-                
-                # Add stock nodes for this industry
-                for stock in sector_dict[sector]['industries'][industry]:
-                    try:
-                        # Get latest price data
-                        latest_date = max(stock['data'].keys())
-                        latest_price = stock['data'][latest_date]
-                        indicators = stock.get('indicators', {})
-                        
-                        nodes.append({
-                            'id': stock['symbol'],
-                            'name': stock['symbol'],
-                            'group': 'stock',
-                            'value': 10,
-                            'price': f"${latest_price['close']:.2f}",
-                            'volume': f"{latest_price['volume']:,}",
-                            'ao': f"{indicators.get('ao', 0):.2f}",
-                            'ac': f"{indicators.get('ac', 0):.2f}"
-                        })
-                        # Link stock to industry
-                        links.append({
-                            'source': industry_id,
-                            'target': stock['symbol'],
-                            'value': 1
-                        })
-                    except Exception as e:
-                        logging.error(f"Error processing stock {stock['symbol']}: {str(e)}")
-                        continue
-
-        return jsonify({'nodes': nodes, 'links': links})
-    except Exception as e:
-        logging.error(f"Error in get_stocks: {str(e)}\n{traceback.format_exc()}")
-        return jsonify({'error': 'Failed to fetch stock data'}), 500
 
-@app.route('/api/last-updated')
-def get_last_updated():
-    try:
-        latest_stock = db['stocks'].find_one(sort=[('last_updated', -1)])
-        last_updated = latest_stock.get('last_updated', '') if latest_stock else ''
-        return jsonify({'last_updated': last_updated})
-    except Exception as e:
-        logging.error(f"Error in get_last_updated: {str(e)}")
-        return jsonify({'error': 'Failed to fetch last update time'}), 500
+def dashboard_state():
+    """Database handles for the current process
 
-if __name__ == '__main__':
+    Created on first use rather than at import, so a pre-forking server
+    can load the app in its master and every worker still opens its own
+    MongoDB connection pool after fork.
+    """
+    pid = os.getpid()
+    if _state.get('pid') != pid:
+        with _state_lock:
+            if _state.get('pid') != pid:
+                db_manager = DatabaseManager()
+                db = db_manager.get_database()
+                db_manager.ensure_indexes()
+                _state.clear()
+                _state.update(
+                    pid=pid, db_manager=db_manager, db=db,
+                    snapshots=SnapshotReader(db), broadcaster=ChangeBroadcaster(db)
+                )
+    return _state
+
+
+def create_app():
+    """Build the dashboard Flask app"""
+    app = Flask(__name__)
+    CORS(app)  # Enable CORS for all routes
+    app.config.update(
+        COMPRESS_ALGORITHM=COMPRESS_ALGORITHMS,
+        COMPRESS_MIN_SIZE=COMPRESS_MIN_SIZE,
+        COMPRESS_MIMETYPES=['application/json', 'text/html', 'text/css', 'application/javascript']
+    )
+    Compress(app)
+    metrics.instrument_app(app)
+
+    @app.route('/')
+    def index():
+        try:
+            return send_from_directory(STATIC_DIR, 'index.html')
+        except Exception as e:
+            logging.error(f"Error serving index.html: {str(e)}")
+            return jsonify({'error': 'Failed to load page'}), 500
+
+    @app.route('/<path:path>')
+    def static_files(path):
+        return send_from_directory(STATIC_DIR, path)
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        # Prometheus text format; counters are per worker process
+        return Response(metrics.REGISTRY.exposition(), content_type=metrics.CONTENT_TYPE)
+
+    @app.route('/api/stocks')
+    def get_stocks():
+        try:
+            # Sector/industry tree precomputed by the agent, served with ETag support
+            return dashboard_state()['snapshots'].response(STOCK_TREE)
+        except Exception as e:
+            logging.error(f"Error in get_stocks: {str(e)}\n{traceback.format_exc()}")
+            return jsonify({'error': 'Failed to fetch stock data'}), 500
+
+    @app.route('/api/graph')
+    def get_graph():
+        try:
+            # Node/link graph precomputed by the agent, served with ETag support
+            return dashboard_state()['snapshots'].response(STOCK_GRAPH)
+        except Exception as e:
+            logging.error(f"Error in get_graph: {str(e)}\n{traceback.format_exc()}")
+            return jsonify({'error': 'Failed to fetch stock graph'}), 500
+
+    @app.route('/api/stocks/query')
+    def query():
+        # Filtered, sorted, cursor-paginated stock list (see stock_query.build_filter)
+        try:
+            return jsonify(query_stocks(dashboard_state()['db'], request.args))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            logging.error(f"Error in query: {str(e)}\n{traceback.format_exc()}")
+            return jsonify({'error': 'Failed to query stocks'}), 500
+
+    @app.route('/api/stream')
+    def stream():
+        # Server-sent per-symbol deltas; event-stream is not in COMPRESS_MIMETYPES so it is never buffered
+        return Response(
+            event_stream(dashboard_state()['broadcaster']),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    @app.route('/api/watchlist')
+    def get_watchlist():
+        try:
+            watchlist = list(dashboard_state()['db'].watchlist.find({}, {'_id': 0}))
+            return jsonify(watchlist)
+        except Exception as e:
+            logging.error(f"Error in get_watchlist: {str(e)}")
+            return jsonify({'error': 'Failed to fetch watchlist'}), 500
+
+    @app.route('/api/last-updated')
+    def get_last_updated():
+        try:
+            latest_stock = dashboard_state()['db']['stocks'].find_one(
+                {}, {'_id': 0, 'last_update': 1}, sort=[('last_update', -1)]
+            )
+            last_updated = latest_stock.get('last_update', '') if latest_stock else ''
+            return jsonify({'last_updated': last_updated})
+        except Exception as e:
+            logging.error(f"Error in get_last_updated: {str(e)}")
+            return jsonify({'error': 'Failed to fetch last update time'}), 500
+
+    @app.route('/api/indicators/<symbol>')
+    def get_indicators(symbol):
+        try:
+            bars = dashboard_state()['db_manager'].get_bars(symbol.upper())
+            series = indicators.compute_series(bars)
+            return jsonify({'symbol': symbol.upper(), 'series': indicators.series_to_records(series)})
+        except Exception as e:
+            logging.error(f"Error in get_indicators: {str(e)}")
+            return jsonify({'error': 'Failed to fetch indicators'}), 500
+
+    return app
+
+
+def run_production():
+    """Serve with gunicorn using gunicorn.conf.py"""
+    from gunicorn.app.base import Application
+
+    class DashboardServer(Application):
+        def load_config(self):
+            self.load_config_from_file(os.path.join(STATIC_DIR, 'gunicorn.conf.py'))
+
+        def load(self):
+            return create_app()
+
+    DashboardServer().run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stock dashboard API server')
+    parser.add_argument('--dev', action='store_true', help="use Flask's single-process development server")
+    args = parser.parse_args()
     try:
-        app.run(debug=True, port=5001)
+        if args.dev:
+            create_app().run(host=SERVER_HOST, port=SERVER_PORT, debug=True)
+        else:
+            run_production()
     except Exception as e:
         logging.error(f"Server error: {str(e)}\n{traceback.format_exc()}")
+        raise
+
+
+if __name__ == '__main__':
+    main()
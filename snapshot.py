@@ -0,0 +1,247 @@
+"""Columnar bar snapshots for offline analysis.
+
+A snapshot is a directory holding one .npy file per column (date, open,
+high, low, close, volume, ao, ac) plus manifest.json. Bars are sorted by
+symbol and then date, so each symbol's bars are the contiguous slice
+[start:end] recorded in the manifest along with its sector, industry,
+market cap and latest indicators. Column files are plain NumPy arrays and
+are memory-mapped when read, so years of history across thousands of
+symbols can be scanned without MongoDB and without loading it into memory.
+
+Usage: python snapshot.py export [--output DIR] [--symbols AAPL MSFT]
+       python snapshot.py import DIR
+       python snapshot.py info DIR
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+from datetime import datetime, timezone
+import numpy as np
+from pymongo import UpdateOne
+import indicators
+from bar_series import BarSeries, FIELDS
+from db_manager import DatabaseManager, bar_operations
+from config import BARS_COLLECTION, DB_NAME, SNAPSHOT_DIR
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+COLUMNS = {
+    'date': np.int64,  # days since 1970-01-01
+    'open': np.float64, 'high': np.float64, 'low': np.float64, 'close': np.float64,
+    'volume': np.int64,
+    'ao': np.float64, 'ac': np.float64  # NaN until enough bars
+}
+STOCK_PROJECTION = {'_id': 0, 'symbol': 1, 'sector': 1, 'industry': 1, 'market_cap': 1, 'indicators': 1}
+
+
+class Snapshot:
+    """Read-only view of an exported snapshot; columns are memory-mapped"""
+
+    def __init__(self, path, mmap_mode='r'):
+        self.path = path
+        with open(os.path.join(path, MANIFEST)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {self.manifest.get('format')} in {path}")
+        self.columns = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in COLUMNS
+        }
+        self.stocks = {entry['symbol']: entry for entry in self.manifest['symbols']}
+        self.offsets = np.array([entry['start'] for entry in self.manifest['symbols']] + [self.bar_count], dtype=np.int64)
+
+    @property
+    def symbols(self):
+        return list(self.stocks)
+
+    @property
+    def bar_count(self):
+        return self.manifest['bars']
+
+    def __len__(self):
+        return len(self.stocks)
+
+    def __contains__(self, symbol):
+        return symbol in self.stocks
+
+    def _slice(self, symbol):
+        entry = self.stocks[symbol]
+        return slice(entry['start'], entry['end'])
+
+    def series(self, symbol):
+        """A symbol's bars as a BarSeries of views onto the mapped columns"""
+        rows = self._slice(symbol)
+        return BarSeries(self.columns['date'][rows], *(self.columns[field][rows] for field in FIELDS))
+
+    def indicator_series(self, symbol):
+        """{'ao', 'ac'} arrays aligned with series(symbol)"""
+        rows = self._slice(symbol)
+        return {'ao': self.columns['ao'][rows], 'ac': self.columns['ac'][rows]}
+
+    def items(self):
+        for symbol in self.stocks:
+            yield symbol, self.series(symbol)
+
+    def symbol_codes(self):
+        """Per-bar index into symbols, for grouping whole-column scans"""
+        return np.repeat(np.arange(len(self.stocks), dtype=np.int32), np.diff(self.offsets))
+
+
+def _stock_entries(db, symbols=None):
+    """Bar counts per symbol, sorted by symbol, joined with stock metadata"""
+    match = [{'$match': {'symbol': {'$in': list(symbols)}}}] if symbols else []
+    counts = db[BARS_COLLECTION].aggregate(match + [
+        {'$group': {'_id': '$symbol', 'bars': {'$sum': 1}}},
+        {'$sort': {'_id': 1}}
+    ])
+    counts = {doc['_id']: doc['bars'] for doc in counts}
+    stocks = {doc['symbol']: doc for doc in db.stocks.find({'symbol': {'$in': list(counts)}}, STOCK_PROJECTION)}
+    entries = []
+    start = 0
+    for symbol, count in counts.items():
+        stock = stocks.get(symbol, {})
+        latest = stock.get('indicators') or {}
+        entries.append({
+            'symbol': symbol,
+            'start': start,
+            'end': start + count,
+            'sector': stock.get('sector'),
+            'industry': stock.get('industry'),
+            'market_cap': stock.get('market_cap'),
+            'ao': latest.get('ao'),
+            'ac': latest.get('ac')
+        })
+        start += count
+    return entries, start
+
+
+def export_snapshot(output=None, symbols=None, overwrite=False, db_manager=None):
+    """Write every stored bar (or only symbols') plus AO/AC to a snapshot directory
+
+    Columns are filled one symbol at a time straight into memory-mapped
+    files, so memory use does not grow with the number of symbols. The
+    snapshot is written to a temporary directory and renamed into place.
+    Returns the snapshot path.
+    """
+    db_manager = db_manager or DatabaseManager()
+    db = db_manager.get_database()
+    created = datetime.now(timezone.utc)
+    output = output or os.path.join(SNAPSHOT_DIR, f"{DB_NAME}-{created:%Y%m%d-%H%M%S}")
+    if os.path.exists(output) and not overwrite:
+        raise FileExistsError(f"{output} already exists")
+
+    entries, total = _stock_entries(db, symbols)
+    tmp_path = f"{output}.tmp-{os.getpid()}"
+    os.makedirs(tmp_path)
+    try:
+        columns = {
+            name: np.lib.format.open_memmap(os.path.join(tmp_path, f"{name}.npy"), mode='w+', dtype=dtype, shape=(total,))
+            for name, dtype in COLUMNS.items()
+        }
+        for entry in entries:
+            series = db_manager.get_bars(entry['symbol'])
+            if len(series) != entry['end'] - entry['start']:
+                raise RuntimeError(f"Bars for {entry['symbol']} changed during export; run it again")
+            rows = slice(entry['start'], entry['end'])
+            columns['date'][rows] = series.dates
+            for field in FIELDS:
+                columns[field][rows] = getattr(series, field)
+            computed = indicators.compute_series(series)
+            columns['ao'][rows] = computed['ao']
+            columns['ac'][rows] = computed['ac']
+            entry['first_date'] = series.first_date
+            entry['last_date'] = series.last_date
+        for column in columns.values():
+            column.flush()
+        del columns
+
+        manifest = {
+            'format': FORMAT_VERSION,
+            'created': created.isoformat(),
+            'database': DB_NAME,
+            'bars': total,
+            'columns': {name: np.dtype(dtype).str for name, dtype in COLUMNS.items()},
+            'symbols': entries
+        }
+        with open(os.path.join(tmp_path, MANIFEST), 'w') as f:
+            json.dump(manifest, f, indent=1)
+        if os.path.exists(output):
+            shutil.rmtree(output)
+        os.replace(tmp_path, output)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    logging.info(f"Exported {total} bars for {len(entries)} symbols to {output}")
+    return output
+
+
+def import_snapshot(path, db_manager=None):
+    """Load a snapshot's bars into the bars collection and refresh each stock
+
+    Bars are upserted, so importing over existing data only adds or
+    overwrites the snapshot's bars. Each stock gets its metadata, latest bar
+    and indicator state from the snapshot. Returns the number of bars.
+    """
+    db_manager = db_manager or DatabaseManager()
+    db_manager.ensure_indexes()
+    snapshot = Snapshot(path)
+    with db_manager.bulk_writer(BARS_COLLECTION) as bar_writer, db_manager.bulk_writer('stocks') as stock_writer:
+        for symbol, series in snapshot.items():
+            bar_writer.add(*bar_operations(symbol, series))
+            entry = snapshot.stocks[symbol]
+            state = indicators.IndicatorState.from_bars(series)
+            stock_writer.add(UpdateOne(
+                {'symbol': symbol},
+                {'$set': {
+                    'symbol': symbol,
+                    'sector': entry['sector'],
+                    'industry': entry['industry'],
+                    'market_cap': entry['market_cap'],
+                    'last_bar_date': series.last_date,
+                    'latest_bar': series.latest(),
+                    'indicators': {'ao': state.ao, 'ac': state.ac, 'last_update': datetime.now().isoformat()},
+                    'indicator_state': state.to_document()
+                }},
+                upsert=True
+            ))
+    logging.info(f"Imported {snapshot.bar_count} bars for {len(snapshot)} symbols from {path}")
+    return snapshot.bar_count
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    export_parser = commands.add_parser('export', help='write a snapshot from MongoDB')
+    export_parser.add_argument('--output', help=f"snapshot directory (default: a new one in {SNAPSHOT_DIR})")
+    export_parser.add_argument('--symbols', nargs='+', help='only these symbols')
+    export_parser.add_argument('--overwrite', action='store_true', help='replace an existing snapshot')
+    import_parser = commands.add_parser('import', help='load a snapshot into MongoDB')
+    import_parser.add_argument('path')
+    info_parser = commands.add_parser('info', help='summarize a snapshot')
+    info_parser.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        path = export_snapshot(args.output, args.symbols, args.overwrite)
+        print(f"Snapshot written to {path}")
+    elif args.command == 'import':
+        count = import_snapshot(args.path)
+        print(f"Imported {count} bars")
+    else:
+        snapshot = Snapshot(args.path)
+        manifest = snapshot.manifest
+        size = sum(column.nbytes for column in snapshot.columns.values())
+        print(f"Created {manifest['created']} from {manifest['database']}")
+        print(f"{len(snapshot)} symbols, {snapshot.bar_count} bars, {size / 2**20:.1f} MiB")
+        for entry in manifest['symbols'][:10]:
+            print(f"- {entry['symbol']}: {entry['end'] - entry['start']} bars "
+                  f"{entry.get('first_date')}..{entry.get('last_date')}")
+        if len(snapshot) > 10:
+            print(f"... and {len(snapshot) - 10} more")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,62 +1,46 @@
 import logging
-from logging.handlers import RotatingFileHandler
-from datetime import datetime, timedelta
-import random
+from datetime import datetime, timezone
 import time
 import traceback
-import os
-from db_manager import DatabaseManager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pymongo import UpdateOne
+from db_manager import DatabaseManager, bar_operations
 from api_manager import APIManager
+from dashboard_cache import publish_dashboard
+from symbol_universe import SymbolUniverse
+from screener import CandidateScreener, to_float
+import indicators
+import metrics
 import config
+from log_config import configure_logging
+from bar_series import BarSeries
+from refresh_scheduler import RefreshScheduler, weekly_stale, fundamentals_due
 
-# Clear existing log file
-try:
-    if os.path.exists('stock_agent.log'):
-        with open('stock_agent.log', 'w') as f:
-            pass  # Just truncate the file
-except Exception as e:
-    print(f"Warning: Could not clear log file: {e}")
+# Bars needed for AO (34) plus the AO history used by AC (4 more)
+INDICATOR_LOOKBACK = indicators.AO_SLOW + indicators.AC_WINDOW - 1
 
-# Set up logging with rotation
-log_handler = RotatingFileHandler(
-    'stock_agent.log',
-    maxBytes=100000,  # Approximately 1000 lines
-    backupCount=1     # Keep one backup file
-)
-log_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-
-# Configure root logger
-root_logger = logging.getLogger()
-root_logger.setLevel(logging.INFO)
-# Remove any existing handlers
-for handler in root_logger.handlers[:]:
-    root_logger.removeHandler(handler)
-root_logger.addHandler(log_handler)
+# JSON lines written by a background thread; see log_config
+configure_logging(config.LOG_FILE)
 
 class StockAgent:
     def __init__(self):
         self.db_manager = DatabaseManager()
         self.api_manager = APIManager()
         self.db = self.db_manager.get_database()
+        self.db_manager.ensure_indexes()
+        self.universe = SymbolUniverse(self.db, self.api_manager)
+        self.screener = CandidateScreener(self.api_manager, self.universe)
+        # Per-symbol writes are batched across the whole refresh cycle
+        self.bar_writer = self.db_manager.bulk_writer(config.BARS_COLLECTION)
+        self.stock_writer = self.db_manager.bulk_writer('stocks')
     
-    def convert_to_datetime(self, date_str):
-        """Convert date string to datetime object"""
-        return datetime.strptime(date_str, '%Y-%m-%d')
-
     def process_time_series(self, time_series):
-        """Convert time series data with string dates to proper format"""
-        processed_data = {}
-        for date_str, values in time_series.items():
-            processed_values = {
-                'timestamp': self.convert_to_datetime(date_str).isoformat(),
-                'open': float(values['1. open']),
-                'high': float(values['2. high']),
-                'low': float(values['3. low']),
-                'close': float(values['4. close']),
-                'volume': int(values['5. volume'])
-            }
-            processed_data[date_str] = processed_values
-        return processed_data
+        """Convert an Alpha Vantage time series into a BarSeries, oldest bar first
+        
+        Parsed column-wise (see time_series.weekly_columns) rather than with
+        strptime and float()/int() per row.
+        """
+        return BarSeries.from_payload(time_series)
 
     def get_random_stocks(self, num_stocks=35, is_initial=True):
         """Get random stocks from Alpha Vantage"""
@@ -68,66 +52,15 @@ class StockAgent:
             if not is_initial:
                 num_stocks = min(10, num_stocks)
             
-            # Get listing of all US stocks
-            listing_data = self.api_manager.get_stock_data(symbol=None, function='LISTING_STATUS')
-            
-            # Filter out existing stocks and get new ones
-            new_stocks = [stock for stock in listing_data if stock['symbol'] not in existing_stocks]
+            # Refresh the local symbol universe (at most once a day) and sample from it
+            self.universe.refresh()
+            new_stocks = self.universe.iter_random(exclude=existing_stocks)
+            selected = self.screener.screen(new_stocks, num_stocks)
             
-            if new_stocks:
-                # Randomly shuffle stocks to avoid always checking the same ones
-                random.shuffle(new_stocks)
-                selected = []
-                
-                # Try stocks until we have enough that meet our criteria
-                for stock in new_stocks:
-                    if len(selected) >= num_stocks:
-                        break
-                        
-                    try:
-                        # Get company overview for market cap
-                        overview = self.api_manager.get_stock_data(
-                            symbol=stock['symbol'],
-                            function='OVERVIEW'
-                        )
-                        
-                        # Get current price
-                        quote = self.api_manager.get_stock_data(
-                            symbol=stock['symbol'],
-                            function='GLOBAL_QUOTE'
-                        )
-                        
-                        # Get weekly data to verify history
-                        weekly_data = self.api_manager.get_stock_data(
-                            symbol=stock['symbol'],
-                            function='TIME_SERIES_WEEKLY'
-                        )
-                        
-                        # Verify we have some weekly data
-                        time_series = weekly_data.get('Weekly Time Series', {})
-                        if not time_series:
-                            logging.info(f"Skipped {stock['symbol']} - No historical data available")
-                            continue
-                        
-                        market_cap = float(overview.get('MarketCapitalization', 0))
-                        price = float(quote.get('Global Quote', {}).get('05. price', 0))
-                        
-                        # Apply market cap and price constraints
-                        if market_cap > 2_000_000_000 and price < 100:  # >$2B cap and <$100 price
-                            selected.append(stock)
-                            dates = sorted(time_series.keys())
-                            oldest_date = dates[0] if dates else 'unknown'
-                            logging.info(f"Selected {stock['symbol']} - Market Cap: ${market_cap:,.2f}, Price: ${price:.2f}, Data since: {oldest_date}")
-                        else:
-                            logging.info(f"Skipped {stock['symbol']} - Market Cap: ${market_cap:,.2f}, Price: ${price:.2f}")
-                            
-                    except Exception as e:
-                        logging.warning(f"Error checking {stock['symbol']}: {str(e)}")
-                        continue
-                
-                # Add selected stocks to watchlist
+            # Add selected stocks to watchlist in one round-trip
+            with self.db_manager.bulk_writer('watchlist') as writer:
                 for stock in selected:
-                    self.db.watchlist.update_one(
+                    writer.add(UpdateOne(
                         {'symbol': stock['symbol']},
                         {'$set': {
                             'symbol': stock['symbol'],
@@ -136,7 +69,8 @@ class StockAgent:
                             'added_date': datetime.now().isoformat()
                         }},
                         upsert=True
-                    )
+                    ))
+            if selected:
                 logging.info(f"Added {len(selected)} new stocks to watchlist")
             else:
                 logging.info("No new stocks to add to watchlist")
@@ -176,39 +110,17 @@ class StockAgent:
                 logging.warning("No data provided for indicator calculation")
                 return None
                 
-            # Sort data by date
-            dates = sorted(data.keys())
-            if len(dates) < 34:  # Need at least 34 weeks for calculations
-                logging.warning(f"Insufficient data points for indicator calculation. Need 34, got {len(dates)}")
+            if len(data) < indicators.AO_SLOW:  # Need at least 34 weeks for calculations
+                logging.warning(f"Insufficient data points for indicator calculation. Need 34, got {len(data)}")
                 return None
-
-            # Get high and low values for AO calculation
-            highs = [float(data[date]['high']) for date in dates]
-            lows = [float(data[date]['low']) for date in dates]
             
-            # Calculate median prices for different periods
-            median_prices = [(high + low) / 2 for high, low in zip(highs, lows)]
-            
-            # Calculate 5-period and 34-period SMAs for AO
-            sma5 = sum(median_prices[-5:]) / 5
-            sma34 = sum(median_prices[-34:]) / 34
-            
-            # Calculate Awesome Oscillator (AO)
-            ao = sma5 - sma34
-            
-            # Calculate Acceleration/Deceleration (AC)
-            # AC = AO - 5-period SMA of AO
-            if len(dates) >= 39:  # Need 5 more periods for AO history
-                prev_aos = []
-                for i in range(5):
-                    idx = -(5+i)
-                    prev_sma5 = sum(median_prices[idx:idx+5]) / 5
-                    prev_sma34 = sum(median_prices[idx-29:idx+5]) / 34
-                    prev_aos.append(prev_sma5 - prev_sma34)
-                ac = ao - (sum(prev_aos) / 5)
-            else:
-                logging.warning(f"Insufficient data points for AC calculation. Need 39, got {len(dates)}")
-                ac = None
+            # AO and AC series over the whole history; the latest bar is the last element
+            with metrics.INDICATOR_LATENCY.time(mode='full'):
+                series = indicators.compute_series(data)
+            ao = indicators.to_scalar(series['ao'][-1])
+            ac = indicators.to_scalar(series['ac'][-1])
+            if ac is None:
+                logging.warning(f"Insufficient data points for AC calculation. Need 38, got {len(data)}")
 
             return {
                 'ao': ao,
@@ -220,69 +132,325 @@ class StockAgent:
             logging.error(f"Error calculating indicators: {str(e)}")
             return None
 
-    def update_stock_data(self):
-        """Update stock data in MongoDB"""
+    def update_symbol(self, symbol):
+        """Fetch, process and store data for a single symbol"""
+        if config.INCREMENTAL_INGESTION:
+            stored = self.db.stocks.find_one(
+                {'symbol': symbol},
+                {'_id': 0, 'last_bar_date': 1, 'latest_bar': 1, 'last_fetch': 1, 'fundamentals_fetch': 1,
+                 'indicator_state': 1}
+            )
+            if stored and stored.get('last_bar_date'):
+                return self.update_symbol_incremental(symbol, stored)
+        
+        # Get stock info and weekly data
+        info = self.get_stock_info(symbol)
+        weekly_data = self.fetch_stock_data(symbol)
+        
+        # Calculate indicators and seed the streaming state from the same bars
+        stock_indicators = self.calculate_indicators(weekly_data)
+        indicator_state = indicators.IndicatorState.from_bars(weekly_data)
+        
+        # Bars live in their own collection; the stock keeps only the latest
+        self.bar_writer.add(*bar_operations(symbol, weekly_data))
+        
+        # Prepare document
+        last_bar_date = weekly_data.last_date
+        doc = {
+            'symbol': symbol,
+            'sector': info.get('Sector'),
+            'industry': info.get('Industry'),
+            'market_cap': to_float(info.get('MarketCapitalization')) or None,
+            'last_bar_date': last_bar_date,
+            'latest_bar': weekly_data.latest(),
+            'indicators': stock_indicators,
+            'indicator_state': indicator_state.to_document(),
+            'last_fetch': datetime.now(timezone.utc).isoformat(),
+            'fundamentals_fetch': datetime.now(timezone.utc).isoformat(),
+            'last_update': datetime.now().isoformat()
+        }
+        
+        # Update or insert (sent with the cycle's next batch)
+        self.stock_writer.add(UpdateOne(
+            {'symbol': symbol},
+            {'$set': doc, '$unset': {'data': ''}},
+            upsert=True
+        ))
+        return True
+
+    def update_symbol_incremental(self, symbol, stored):
+        """Fetch only the datasets that can have changed since the last fetch
+        
+        Weekly bars are requested once a weekly bar has been finalized since
+        the last fetch, and only new or changed bars are stored; the OVERVIEW
+        is requested once fundamentals are FUNDAMENTALS_REFRESH_DAYS old.
+        Returns False without spending any requests when neither is due.
+        """
+        now = datetime.now(timezone.utc)
+        fetch_weekly = weekly_stale(stored, now)
+        fundamentals_at = fundamentals_due(stored, now)
+        fetch_fundamentals = fundamentals_at is None or fundamentals_at <= now
+        if not fetch_weekly and not fetch_fundamentals:
+            logging.info(f"Skipped {symbol} - no weekly close or fundamentals due since last fetch")
+            return False
+        
+        update = {'last_update': datetime.now().isoformat()}
+        if fetch_fundamentals:
+            info = self.get_stock_info(symbol)
+            update.update({
+                'sector': info.get('Sector'),
+                'industry': info.get('Industry'),
+                'market_cap': to_float(info.get('MarketCapitalization')) or None,
+                'fundamentals_fetch': now.isoformat()
+            })
+        if fetch_weekly:
+            update.update(self.fetch_new_bars(symbol, stored))
+            update['last_fetch'] = now.isoformat()
+        
+        self.stock_writer.add(UpdateOne({'symbol': symbol}, {'$set': update}))
+        return True
+
+    def fetch_new_bars(self, symbol, stored):
+        """Queue bars that are new or changed since the last fetch; returns stock fields to set
+        
+        Always requested from the network: the fetch is recorded as last_fetch,
+        so a cached payload from before the weekly close would hide that
+        week's final bar until the next one.
+        
+        Besides bars after last_bar_date, the INDICATOR_LOOKBACK weeks up to
+        it are compared with the stored bars, so revisions that affect the
+        indicators are stored and the indicator state is rebuilt. Revisions
+        to older bars are not checked.
+        """
+        weekly_data = self.api_manager.get_stock_data(
+            symbol=symbol,
+            function='TIME_SERIES_WEEKLY',
+            use_cache=False
+        )
+        series = self.process_time_series(weekly_data['Weekly Time Series'])
+        
+        last_bar_date = stored['last_bar_date']
+        window = series.between(end=last_bar_date).tail(INDICATOR_LOOKBACK)
+        recent = series.between(start=window.first_date or last_bar_date)
+        changed = recent.changed_from(self.db_manager.get_latest_bars(symbol, INDICATOR_LOOKBACK))
+        logging.info(f"Stored {len(changed)} new or changed bars for {symbol}")
+        if not changed:
+            return {}
+        
+        self.bar_writer.add(*bar_operations(symbol, changed))
+        state = self.advance_indicator_state(symbol, stored.get('indicator_state'), changed)
+        update = {
+            'indicator_state': state.to_document(),
+            'indicators': {
+                'ao': state.ao,
+                'ac': state.ac,
+                'last_update': datetime.now().isoformat()
+            }
+        }
+        if recent.last_date >= last_bar_date:
+            update.update({'last_bar_date': recent.last_date, 'latest_bar': recent.latest()})
+        return update
+
+    def refresh_quotes(self):
+        """Update latest price and volume for the whole watchlist in a few bulk requests
+        
+        Returns {'symbols', 'updated', 'failed'}; failed lists the symbols
+        whose batch request failed, so the caller can retry.
+        """
+        if self.api_manager.bulk_quotes_supported is False:
+            return {'symbols': 0, 'updated': 0, 'failed': []}
+        symbols = [doc['symbol'] for doc in self.db.watchlist.find({}, {'symbol': 1})]
+        failed = []
+        quotes = self.api_manager.get_bulk_quotes(symbols, fallback=False, failed=failed)
+        updated_at = datetime.now().isoformat()
+        with self.db_manager.bulk_writer('stocks') as writer:
+            for symbol, quote in quotes.items():
+                writer.add(UpdateOne(
+                    {'symbol': symbol},
+                    # last_update drives the stream's polling fallback
+                    {'$set': {'quote': dict(quote, updated_at=updated_at), 'last_update': updated_at}}
+                ))
+        logging.info(f"Refreshed quotes for {len(quotes)}/{len(symbols)} symbols ({len(failed)} failed)")
+        return {'symbols': len(symbols), 'updated': len(quotes), 'failed': failed}
+
+    def advance_indicator_state(self, symbol, state_doc, bars):
+        """Apply new bars to a symbol's stored indicator state in constant time
+        
+        Falls back to rebuilding the state from the latest stored bars when
+        there is no state yet or an older bar was corrected.
+        """
+        state = indicators.IndicatorState.from_document(state_doc)
+        if state is not None:
+            with metrics.INDICATOR_LATENCY.time(mode='incremental'):
+                for date_str, high, low in zip(bars.date_strings(), bars.high.tolist(), bars.low.tolist()):
+                    if not state.update(date_str, high, low):
+                        logging.info(f"History corrected for {symbol}, recomputing indicator state")
+                        state = None
+                        break
+        if state is None:
+            # The new bars may still be queued in the bar writer
+            history = self.db_manager.get_latest_bars(symbol, INDICATOR_LOOKBACK).merge(bars)
+            with metrics.INDICATOR_LATENCY.time(mode='rebuild'):
+                state = indicators.IndicatorState.from_bars(history)
+        return state
+
+    def flush_writes(self):
+        """Send any queued bar and stock writes"""
+        self.bar_writer.flush()
+        self.stock_writer.flush()
+
+    def _timed_update(self, symbol):
+        """Update a symbol and return whether it was fetched plus its latency in seconds"""
+        start = time.perf_counter()
+        fetched = self.update_symbol(symbol)
+        return fetched, time.perf_counter() - start
+
+    def update_stock_data(self, symbols=None):
+        """Update stock data in MongoDB for symbols (default: the whole watchlist)
+        
+        Symbols are refreshed concurrently by a bounded thread pool. Pacing is
+        left entirely to the API manager's rate limiter, so a cycle takes as long
+        as the request quota requires and no longer.
+        """
         try:
-            watchlist = list(self.db.watchlist.find())
+            if symbols is None:
+                symbols = [doc['symbol'] for doc in self.db.watchlist.find({}, {'symbol': 1})]
+            latencies = {}
+            skipped = []
+            failed = []
+            cycle_start = time.perf_counter()
+            metrics_before = metrics.REGISTRY.snapshot()
             
-            for stock in watchlist:
-                symbol = stock['symbol']
-                logging.info(f"Updating data for {symbol}")
-                
-                # Get stock info and weekly data
-                info = self.get_stock_info(symbol)
-                weekly_data = self.fetch_stock_data(symbol)
-                
-                # Calculate indicators
-                indicators = self.calculate_indicators(weekly_data)
-                
-                # Prepare document
-                doc = {
-                    'symbol': symbol,
-                    'sector': info.get('Sector'),
-                    'industry': info.get('Industry'),
-                    'market_cap': info.get('MarketCapitalization'),
-                    'data': weekly_data,
-                    'indicators': indicators,
-                    'last_update': datetime.now().isoformat()
-                }
-                
-                # Update or insert
-                self.db.stocks.update_one(
-                    {'symbol': symbol},
-                    {'$set': doc},
-                    upsert=True
+            with ThreadPoolExecutor(max_workers=config.REFRESH_WORKERS) as executor:
+                futures = {executor.submit(self._timed_update, symbol): symbol for symbol in symbols}
+                for future in as_completed(futures):
+                    symbol = futures[future]
+                    try:
+                        fetched, latency = future.result()
+                        if not fetched:
+                            skipped.append(symbol)
+                            continue
+                        latencies[symbol] = latency
+                        logging.info(f"Updated {symbol} in {latency:.2f}s")
+                    except Exception as e:
+                        failed.append(symbol)
+                        logging.error(f"Error updating {symbol}: {str(e)}")
+            
+            self.flush_writes()
+            
+            # Rebuild the dashboard payloads once per cycle, only if data changed
+            if latencies:
+                publish_dashboard(self.db)
+            
+            wall_time = time.perf_counter() - cycle_start
+            metrics.CYCLE_LATENCY.observe(wall_time)
+            metrics.CYCLE_SYMBOLS.inc(len(latencies), outcome='updated')
+            metrics.CYCLE_SYMBOLS.inc(len(skipped), outcome='skipped')
+            metrics.CYCLE_SYMBOLS.inc(len(failed), outcome='failed')
+            stats = {
+                'symbols': len(symbols),
+                'updated': len(latencies),
+                'skipped': len(skipped),
+                'failed': failed,
+                'wall_time': wall_time,
+                'latencies': latencies
+            }
+            if latencies:
+                ordered = sorted(latencies.values())
+                stats['latency_p50'] = ordered[len(ordered) // 2]
+                stats['latency_max'] = ordered[-1]
+                logging.info(
+                    f"Refresh cycle finished: {len(latencies)}/{len(symbols)} symbols in {wall_time:.2f}s "
+                    f"(p50 {stats['latency_p50']:.2f}s, max {stats['latency_max']:.2f}s, "
+                    f"{len(skipped)} skipped, {len(failed)} failed)"
                 )
-                
-                time.sleep(12)  # Respect API rate limits
+            else:
+                logging.info(
+                    f"Refresh cycle finished: 0/{len(symbols)} symbols in {wall_time:.2f}s "
+                    f"({len(skipped)} skipped, {len(failed)} failed)"
+                )
+            stats['metrics'] = self.record_cycle_metrics(metrics_before, wall_time)
+            return stats
                 
         except Exception as e:
             logging.error(f"Error in update_stock_data: {str(e)}\n{traceback.format_exc()}")
             raise
 
+    def record_cycle_metrics(self, before, wall_time):
+        """Store and log what changed in the metrics during one refresh cycle
+        
+        The summary shows where the cycle's time went: API latency per
+        function, rate limiter waits, MongoDB commands and indicator math.
+        """
+        summary = metrics.diff(before, metrics.REGISTRY.snapshot())
+        
+        def total(name):
+            return sum(summary.get(name, {}).values())
+        
+        logging.info(
+            f"Cycle time: {wall_time:.2f}s wall, "
+            f"{total('alpha_vantage_request_seconds_sum'):.2f}s in {total('alpha_vantage_request_seconds_count'):.0f} API requests, "
+            f"{total('rate_limit_wait_seconds_sum'):.2f}s rate limited, "
+            f"{total('mongodb_command_seconds_sum'):.2f}s in {total('mongodb_command_seconds_count'):.0f} MongoDB commands, "
+            f"{total('indicator_compute_seconds_sum'):.3f}s computing indicators"
+        )
+        try:
+            self.db[config.CYCLE_METRICS_COLLECTION].insert_one({
+                'finished_at': datetime.now().isoformat(),
+                'wall_time': wall_time,
+                'metrics': summary
+            })
+        except Exception as e:
+            logging.warning(f"Could not store cycle metrics: {str(e)}")
+        return summary
+
     def run(self):
-        """Run the stock agent"""
+        """Run the stock agent
+        
+        Each pass refreshes only the symbols the scheduler reports as due
+        (most overdue first), refreshes quotes while the market is open, tops
+        up the watchlist during market hours, then sleeps until the next item
+        falls due.
+        """
         try:
             # Get initial batch of stocks
             self.get_random_stocks(is_initial=True)
+            scheduler = RefreshScheduler(self.db)
+            scheduler.last_topup = datetime.now(timezone.utc)
             
-            # Main loop
             while True:
                 try:
-                    # Update stock data
-                    self.update_stock_data()
+                    now = datetime.now(timezone.utc)
+                    scheduler.sync_watchlist(now)
                     
-                    # Calculate indicators
-                    self.calculate_indicators(None)
+                    # Symbols whose weekly bars or fundamentals can be new
+                    due = scheduler.pop_due(now, limit=config.REFRESH_BATCH_SIZE)
+                    if due:
+                        stats = self.update_stock_data(due)
+                        scheduler.reschedule(due, failed=stats['failed'])
+                    
+                    # Latest prices in bulk; republish if any changed
+                    if scheduler.quotes_due_at(now) <= now:
+                        quotes = self.refresh_quotes()
+                        if quotes['failed']:
+                            scheduler.retry_quotes(now)
+                        else:
+                            scheduler.last_quotes = now
+                        if quotes['updated']:
+                            publish_dashboard(self.db)
                     
                     # Get more stocks if needed
-                    watchlist = list(self.db.watchlist.find())
-                    if len(watchlist) < 35:
+                    topup = scheduler.topup_due_at(now)
+                    if topup is not None and topup <= now:
+                        scheduler.last_topup = now
                         self.get_random_stocks(is_initial=False)
+                        continue
                     
-                    # Sleep for 15 minutes
-                    logging.info("Sleeping for 15 minutes...")
-                    time.sleep(15 * 60)
+                    wakeup = scheduler.next_wakeup()
+                    delay = (wakeup - datetime.now(timezone.utc)).total_seconds()
+                    if delay > 0:
+                        logging.info(f"Sleeping until {wakeup.isoformat(timespec='seconds')} ({len(scheduler)} symbols scheduled)")
+                        time.sleep(delay)
                     
                 except Exception as e:
                     logging.error(f"Error in main loop: {str(e)}")
@@ -298,6 +466,8 @@ class StockAgent:
         self.db_manager.close()
 
 def main():
+    if config.METRICS_PORT:
+        metrics.start_http_server(config.METRICS_PORT, config.METRICS_HOST)
     agent = StockAgent()
     agent.run()
 
@@ -0,0 +1,165 @@
+import base64
+import json
+import pymongo
+
+# Public sort keys and the stored fields behind them; each has a (field, symbol) index
+SORT_FIELDS = {
+    'symbol': 'symbol',
+    'market_cap': 'market_cap',
+    'ao': 'indicators.ao',
+    'ac': 'indicators.ac',
+    'last_update': 'last_update'
+}
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+QUERY_PROJECTION = {
+    '_id': 0, 'symbol': 1, 'sector': 1, 'industry': 1, 'market_cap': 1,
+    'latest_bar.close': 1, 'latest_bar.volume': 1, 'quote.price': 1, 'quote.volume': 1,
+    'indicators.ao': 1, 'indicators.ac': 1, 'last_update': 1
+}
+
+
+def _number(args, name):
+    value = args.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+
+def _range(args, field, low_name, high_name):
+    condition = {}
+    low = _number(args, low_name)
+    high = _number(args, high_name)
+    if low is not None:
+        condition['$gte'] = low
+    if high is not None:
+        condition['$lte'] = high
+    return {field: condition} if condition else {}
+
+
+def _sign(args, name, field):
+    sign = args.get(name)
+    if not sign:
+        return {}
+    if sign == 'positive':
+        return {field: {'$gt': 0}}
+    if sign == 'negative':
+        return {field: {'$lt': 0}}
+    raise ValueError(f"{name} must be 'positive' or 'negative'")
+
+
+def build_filter(args):
+    """MongoDB filter from query-string arguments
+
+    Supports sector, industry, min/max_market_cap, ao_sign/ac_sign
+    (positive|negative) and min/max_ao, min/max_ac thresholds. Raises
+    ValueError for malformed values.
+    """
+    clauses = []
+    for name in ('sector', 'industry'):
+        if args.get(name):
+            clauses.append({name: args[name]})
+    clauses.append(_range(args, 'market_cap', 'min_market_cap', 'max_market_cap'))
+    clauses.append(_sign(args, 'ao_sign', 'indicators.ao'))
+    clauses.append(_sign(args, 'ac_sign', 'indicators.ac'))
+    clauses.append(_range(args, 'indicators.ao', 'min_ao', 'max_ao'))
+    clauses.append(_range(args, 'indicators.ac', 'min_ac', 'max_ac'))
+    clauses = [clause for clause in clauses if clause]
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {'$and': clauses}
+
+
+def parse_sort(value):
+    """'market_cap' or '-market_cap' -> (public key, stored field, direction)"""
+    value = value or 'symbol'
+    direction = pymongo.DESCENDING if value.startswith('-') else pymongo.ASCENDING
+    key = value.lstrip('-')
+    if key not in SORT_FIELDS:
+        raise ValueError(f"sort must be one of: {', '.join(SORT_FIELDS)}")
+    return key, SORT_FIELDS[key], direction
+
+
+def encode_cursor(sort_key, value, symbol):
+    raw = json.dumps([sort_key, value, symbol], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor, sort_key):
+    try:
+        key, value, symbol = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if key != sort_key:
+        raise ValueError("Cursor was issued for a different sort")
+    return value, symbol
+
+
+def _get(doc, field):
+    for part in field.split('.'):
+        doc = (doc or {}).get(part)
+    return doc
+
+
+def to_item(doc):
+    """Flat API representation of a stock document"""
+    latest_bar = doc.get('latest_bar') or {}
+    quote = doc.get('quote') or {}
+    indicators = doc.get('indicators') or {}
+    return {
+        'symbol': doc['symbol'],
+        'sector': doc.get('sector'),
+        'industry': doc.get('industry'),
+        'market_cap': doc.get('market_cap'),
+        'price': quote.get('price', latest_bar.get('close')),
+        'volume': quote.get('volume', latest_bar.get('volume')),
+        'ao': indicators.get('ao'),
+        'ac': indicators.get('ac'),
+        'last_update': doc.get('last_update')
+    }
+
+
+def query_stocks(db, args):
+    """One page of stocks matching args; returns {'items', 'next_cursor'}
+
+    Pagination is keyset based: the cursor holds the last item's sort value
+    and symbol, so every page is an index range scan rather than a skip.
+    Stocks without a value for the sort key are left out when sorting by it.
+    """
+    sort_key, field, direction = parse_sort(args.get('sort'))
+    try:
+        limit = min(int(args.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if limit < 1:
+        raise ValueError("limit must be positive")
+
+    clauses = [build_filter(args)]
+    if field != 'symbol':
+        clauses.append({field: {'$ne': None}})
+    if args.get('cursor'):
+        value, symbol = decode_cursor(args['cursor'], sort_key)
+        after = '$gt' if direction == pymongo.ASCENDING else '$lt'
+        if field == 'symbol':
+            clauses.append({'symbol': {after: symbol}})
+        else:
+            clauses.append({'$or': [
+                {field: {after: value}},
+                {field: value, 'symbol': {after: symbol}}
+            ]})
+    clauses = [clause for clause in clauses if clause]
+    query = {'$and': clauses} if clauses else {}
+
+    sort = [(field, direction)] if field == 'symbol' else [(field, direction), ('symbol', direction)]
+    docs = list(db.stocks.find(query, QUERY_PROJECTION).sort(sort).limit(limit + 1))
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        last = docs[-1]
+        next_cursor = encode_cursor(sort_key, _get(last, field), last['symbol'])
+    return {'items': [to_item(doc) for doc in docs], 'next_cursor': next_cursor}
@@ -0,0 +1,183 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+import pymongo
+from pymongo.errors import OperationFailure, PyMongoError
+from config import STREAM_POLL_INTERVAL, STREAM_POLL_OVERLAP, STREAM_HEARTBEAT
+
+# Fields a delta is built from; an update touching none of them is not sent
+DELTA_SOURCES = ('latest_bar', 'quote', 'indicators')
+DELTA_PROJECTION = {'_id': 0, 'symbol': 1, 'latest_bar': 1, 'quote': 1, 'indicators': 1, 'last_update': 1}
+
+
+def delta_from_document(doc):
+    """Per-symbol values the dashboard shows, with the bulk quote preferred for price/volume"""
+    latest_bar = doc.get('latest_bar') or {}
+    quote = doc.get('quote') or {}
+    indicators = doc.get('indicators') or {}
+    return {
+        'symbol': doc['symbol'],
+        'price': quote.get('price', latest_bar.get('close')),
+        'volume': quote.get('volume', latest_bar.get('volume')),
+        'ao': indicators.get('ao'),
+        'ac': indicators.get('ac')
+    }
+
+
+class Subscriber:
+    """One connected client's pending deltas, coalesced per symbol
+
+    A slow client never queues more than one delta per symbol; it simply
+    receives the latest values when it catches up.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._condition = threading.Condition()
+
+    def push(self, delta):
+        with self._condition:
+            self._pending[delta['symbol']] = delta
+            self._condition.notify()
+
+    def wait(self, timeout):
+        """Block until deltas are pending or timeout passes; returns them (possibly none)"""
+        with self._condition:
+            if not self._pending:
+                self._condition.wait(timeout)
+            deltas = list(self._pending.values())
+            self._pending.clear()
+        return deltas
+
+
+class ChangeBroadcaster:
+    """Fans changes to the stocks collection out to every connected client
+
+    One background thread per process watches the collection, using a
+    change stream when the server supports it (replica set or sharded
+    cluster) and otherwise polling the last_update index. Each client only
+    registers a Subscriber, so the database cost does not grow with the
+    number of open dashboards.
+    """
+
+    def __init__(self, db):
+        self.collection = db.stocks
+        self.mode = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._last_sent = {}
+        self._thread = None
+
+    def subscribe(self):
+        subscriber = Subscriber()
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='stock-stream', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def client_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, doc):
+        """Send a document's delta to all subscribers if its values changed"""
+        delta = delta_from_document(doc)
+        if self._last_sent.get(delta['symbol']) == delta:
+            return False
+        self._last_sent[delta['symbol']] = delta
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.push(delta)
+        return True
+
+    def _run(self):
+        try:
+            self._watch()
+        except OperationFailure as e:
+            # Standalone servers have no change streams (code 40573)
+            logging.info(f"Change streams unavailable ({e.code}), polling last_update instead")
+        self._poll()
+
+    def _watch(self):
+        """Follow the change stream, resuming after transient errors"""
+        pipeline = [{'$match': {'operationType': {'$in': ['insert', 'update', 'replace']}}}]
+        resume_token = None
+        while True:
+            try:
+                with self.collection.watch(
+                    pipeline, full_document='updateLookup', resume_after=resume_token
+                ) as stream:
+                    self.mode = 'change_stream'
+                    logging.info("Streaming stock changes from a MongoDB change stream")
+                    for change in stream:
+                        resume_token = stream.resume_token
+                        doc = change.get('fullDocument')
+                        if doc is None or not self._touches_delta(change):
+                            continue
+                        self.publish(doc)
+            except OperationFailure:
+                if self.mode is None:
+                    raise
+                logging.warning("Change stream failed, resuming in 5 seconds")
+                time.sleep(5)
+            except PyMongoError as e:
+                logging.warning(f"Change stream interrupted: {str(e)}, resuming in 5 seconds")
+                time.sleep(5)
+
+    @staticmethod
+    def _touches_delta(change):
+        if change['operationType'] != 'update':
+            return True
+        updated = change.get('updateDescription', {}).get('updatedFields', {})
+        return any(field.split('.')[0] in DELTA_SOURCES for field in updated)
+
+    def _poll(self):
+        """Re-read recently updated stocks on an interval
+
+        Writes are batched, so a document can land after others stamped
+        later; each poll re-reads an overlap window and relies on publish()
+        to drop anything already sent.
+        """
+        self.mode = 'poll'
+        since = datetime.now().isoformat()
+        # Values already on the dashboard must not be re-sent on the first poll
+        for doc in self.collection.find({}, DELTA_PROJECTION):
+            delta = delta_from_document(doc)
+            self._last_sent[delta['symbol']] = delta
+        while True:
+            time.sleep(STREAM_POLL_INTERVAL)
+            try:
+                window_start = (datetime.fromisoformat(since) - timedelta(seconds=STREAM_POLL_OVERLAP)).isoformat()
+                cursor = self.collection.find(
+                    {'last_update': {'$gt': window_start}}, DELTA_PROJECTION
+                ).sort('last_update', pymongo.ASCENDING)
+                for doc in cursor:
+                    since = max(since, doc['last_update'])
+                    self.publish(doc)
+            except PyMongoError as e:
+                logging.warning(f"Polling for stock changes failed: {str(e)}")
+
+
+def event_stream(broadcaster):
+    """Server-sent events for one client: a 'delta' event per batch of changed symbols"""
+    subscriber = broadcaster.subscribe()
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            deltas = subscriber.wait(STREAM_HEARTBEAT)
+            if deltas:
+                yield f"event: delta\ndata: {json.dumps(deltas, separators=(',', ':'))}\n\n"
+            else:
+                # Comment line keeps proxies from closing an idle connection
+                yield ': keep-alive\n\n'
+    finally:
+        broadcaster.unsubscribe(subscriber)
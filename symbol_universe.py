@@ -0,0 +1,113 @@
+import logging
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from config import UNIVERSE_REFRESH_HOURS, CACHE_TTLS, SCREEN_MIN_MARKET_CAP
+
+UNIVERSE_COLLECTION = 'symbol_universe'
+# Refresh bookkeeping: one document per dataset (_id), written when its refresh finishes
+METADATA_COLLECTION = 'metadata'
+WRITE_BATCH_SIZE = 1000
+
+
+class SymbolUniverse:
+    """Local index of listed stocks, refreshed from LISTING_STATUS once a day
+
+    Candidate selection samples from this collection instead of downloading
+    and parsing the full listing on every watchlist top-up. Freshness comes
+    from a metadata document written after a refresh completes, so a listing
+    download that fails partway is retried on the next call.
+    """
+
+    def __init__(self, db, api_manager):
+        self.collection = db[UNIVERSE_COLLECTION]
+        self.metadata = db[METADATA_COLLECTION]
+        self.api_manager = api_manager
+        self.collection.create_index('symbol', unique=True)
+        self.collection.create_index('refreshed_at')
+
+    def last_refresh(self):
+        """Start time of the last refresh that finished, or None"""
+        doc = self.metadata.find_one({'_id': UNIVERSE_COLLECTION})
+        return doc['refreshed_at'] if doc else None
+
+    def is_stale(self):
+        last_refresh = self.last_refresh()
+        return last_refresh is None or datetime.now() - last_refresh >= timedelta(hours=UNIVERSE_REFRESH_HOURS)
+
+    def refresh(self, force=False):
+        """Stream the listing into the collection if it is older than a day
+
+        Rows are written in batches while the CSV is still downloading, and
+        symbols missing from the new listing are removed afterwards. Only then
+        is the refresh recorded as complete.
+        """
+        if not force and not self.is_stale():
+            return 0
+        refreshed_at = datetime.now()
+        batch = []
+        count = 0
+        for stock in self.api_manager.iter_listing():
+            if not stock['symbol']:
+                continue
+            batch.append(UpdateOne(
+                {'symbol': stock['symbol']},
+                {'$set': dict(stock, refreshed_at=refreshed_at)},
+                upsert=True
+            ))
+            if len(batch) >= WRITE_BATCH_SIZE:
+                self.collection.bulk_write(batch, ordered=False)
+                count += len(batch)
+                batch = []
+        if batch:
+            self.collection.bulk_write(batch, ordered=False)
+            count += len(batch)
+        if count:
+            removed = self.collection.delete_many({'refreshed_at': {'$lt': refreshed_at}}).deleted_count
+            self.metadata.replace_one(
+                {'_id': UNIVERSE_COLLECTION},
+                {'refreshed_at': refreshed_at, 'completed_at': datetime.now(), 'stocks': count, 'removed': removed},
+                upsert=True
+            )
+            logging.info(f"Refreshed symbol universe: {count} active stocks, {removed} delisted")
+        else:
+            logging.warning("Listing returned no active stocks, keeping the previous symbol universe")
+        return count
+
+    def remember(self, symbol, **facts):
+        """Store screening facts (e.g. market_cap) so later samples can skip the symbol"""
+        self.collection.update_one(
+            {'symbol': symbol},
+            {'$set': dict(facts, screened_at=datetime.now())}
+        )
+
+    def sample(self, size, exclude=()):
+        """Random active stocks that are not in exclude
+        
+        Symbols whose remembered market cap is still fresh and below the
+        screening minimum are never returned.
+        """
+        fundamentals_expiry = datetime.now() - timedelta(seconds=CACHE_TTLS['OVERVIEW'])
+        return list(self.collection.aggregate([
+            {'$match': {
+                'symbol': {'$nin': list(exclude)},
+                '$or': [
+                    {'market_cap': {'$gt': SCREEN_MIN_MARKET_CAP}},
+                    {'market_cap': {'$exists': False}},
+                    {'screened_at': {'$lt': fundamentals_expiry}}
+                ]
+            }},
+            {'$sample': {'size': size}},
+            {'$project': {'_id': 0, 'symbol': 1, 'name': 1, 'exchange': 1}}
+        ]))
+
+    def iter_random(self, exclude=(), batch_size=100):
+        """Yield random candidates in small batches without repeating a symbol"""
+        seen = set(exclude)
+        while True:
+            batch = self.sample(batch_size, seen)
+            if not batch:
+                return
+            for stock in batch:
+                if stock['symbol'] not in seen:
+                    seen.add(stock['symbol'])
+                    yield stock
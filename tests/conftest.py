@@ -0,0 +1,44 @@
+"""Point the application config at in-memory stand-ins before any project import.
+
+MongoDB is mongomock, set up as in benchmarks/bench_suite.py: every client
+shares one store and benchmarks/mongomock_compat.py adds the aggregation
+operators mongomock lacks. Alpha Vantage requests are answered by
+monkeypatching APIManager methods in the tests themselves.
+"""
+import os
+import sys
+import tempfile
+
+import mongomock
+import pymongo
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+import mongomock_compat  # noqa: E402  (benchmarks/)
+
+TEST_DIR = tempfile.mkdtemp(prefix='stock_agent_tests-')
+os.environ.update({
+    'ALPHA_VANTAGE_API_KEY': 'test',
+    'VERIFY_API_ACCESS': 'false',
+    'RATE_LIMIT_BACKEND': 'memory',
+    'CACHE_BACKEND': 'none',
+    'DB_NAME': 'stock_data_test',
+    'METRICS_PORT': '0',
+    'LOG_FILE': os.path.join(TEST_DIR, 'stock_agent.log')
+})
+
+mongomock_compat.install()
+_store = mongomock.store.ServerStore()
+pymongo.MongoClient = lambda *a, **kw: mongomock.MongoClient(*a, _store=_store, **kw)
+
+
+@pytest.fixture
+def agent():
+    from stock_agent import StockAgent
+    pymongo.MongoClient().drop_database(os.environ['DB_NAME'])
+    agent = StockAgent()
+    yield agent
+    agent.api_manager.close()
@@ -0,0 +1,14 @@
+from dashboard_cache import build_stock_tree
+
+
+def test_stock_tree_converts_legacy_market_cap(agent):
+    agent.db.stocks.insert_many([
+        {'symbol': 'NUM', 'sector': 'TECHNOLOGY', 'industry': 'SOFTWARE', 'market_cap': 2.5e9},
+        {'symbol': 'STR', 'sector': 'TECHNOLOGY', 'industry': 'SOFTWARE', 'market_cap': '1500000000'},
+        {'symbol': 'BAD', 'sector': 'TECHNOLOGY', 'industry': 'SOFTWARE', 'market_cap': 'None'},
+        {'symbol': 'NIL', 'sector': 'TECHNOLOGY', 'industry': 'SOFTWARE'}
+    ])
+    [sector] = build_stock_tree(agent.db)
+    [industry] = sector['children']
+    market_caps = {stock['name']: stock['market_cap'] for stock in industry['children']}
+    assert market_caps == {'BAD': 0, 'NIL': 0, 'NUM': 2.5e9, 'STR': 1.5e9}
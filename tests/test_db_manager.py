@@ -0,0 +1,20 @@
+from db_manager import DatabaseManager
+
+
+def test_agent_db_survives_heartbeat_outage_and_fork(agent, monkeypatch):
+    db_manager = DatabaseManager()
+    old_client = db_manager.client
+    closed = []
+    monkeypatch.setattr(old_client, 'close', lambda: closed.append(True))
+
+    # Heartbeats failing for a long time: pymongo's monitor recovers, the client is kept
+    db_manager.stats.last_heartbeat_ok -= 3600
+    assert db_manager.get_database() is agent.db
+
+    # A forked child gets its own client; the inherited one is never closed
+    monkeypatch.setattr(db_manager, '_pid', -1)
+    assert db_manager.get_database() is not agent.db
+    assert not closed
+
+    agent.db.watchlist.insert_one({'symbol': 'TEST'})
+    assert agent.db.watchlist.find_one({'symbol': 'TEST'})['symbol'] == 'TEST'
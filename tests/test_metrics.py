@@ -0,0 +1,12 @@
+import metrics
+
+
+def test_metrics_server_binds_localhost_and_tolerates_busy_port():
+    server = metrics.start_http_server(0)
+    try:
+        host, port = server.server_address
+        assert host == '127.0.0.1'
+        assert metrics.start_http_server(port) is None
+    finally:
+        server.shutdown()
+        server.server_close()
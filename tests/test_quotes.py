@@ -0,0 +1,35 @@
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+import api_manager
+from refresh_scheduler import RefreshScheduler, REFRESH_RETRY_MINUTES
+
+TUESDAY = datetime(2024, 6, 18, 15, 0, tzinfo=timezone.utc)
+
+
+def test_failed_bulk_quote_batch_keeps_other_quotes(agent, monkeypatch):
+    monkeypatch.setattr(api_manager, 'BULK_QUOTE_BATCH_SIZE', 2)
+    symbols = ['AAA', 'BBB', 'CCC', 'DDD']
+    agent.db.watchlist.insert_many([{'symbol': symbol} for symbol in symbols])
+    agent.db.stocks.insert_many([{'symbol': symbol} for symbol in symbols])
+
+    def fetch(batch):
+        if 'CCC' in batch:
+            raise requests.HTTPError('503 Server Error')
+        agent.api_manager.bulk_quotes_supported = True
+        return [{'symbol': symbol, 'close': '10.5', 'volume': '100'} for symbol in batch]
+
+    monkeypatch.setattr(agent.api_manager, '_fetch_bulk_quotes', fetch)
+    result = agent.refresh_quotes()
+
+    assert result['updated'] == 2
+    assert result['failed'] == ['CCC', 'DDD']
+    assert agent.db.stocks.find_one({'symbol': 'AAA'})['quote']['price'] == 10.5
+
+
+def test_failed_quote_refresh_is_retried():
+    scheduler = RefreshScheduler(None)
+    scheduler.retry_quotes(TUESDAY)
+    assert scheduler.last_quotes is None
+    assert scheduler.quotes_due_at(TUESDAY) == TUESDAY + timedelta(minutes=REFRESH_RETRY_MINUTES)
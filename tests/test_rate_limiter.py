@@ -0,0 +1,32 @@
+import pytest
+
+import rate_limiter
+from rate_limiter import RateLimiter
+
+
+def send_times(limiter, requests, monkeypatch):
+    """When each of requests back-to-back callers is let through, starting idle at t=0"""
+    clock = [0.0]
+    monkeypatch.setattr(rate_limiter.time, 'time', lambda: clock[0])
+    times = []
+    for _ in range(requests):
+        clock[0] += limiter._reserve()
+        times.append(round(clock[0], 6))  # ignore float drift in the accumulated clock
+    return times
+
+
+def busiest_minute(times):
+    """Most requests in any half-open 60 s window"""
+    return max(sum(start <= t < start + 60 for t in times) for start in times)
+
+
+@pytest.mark.parametrize('burst', [1, 5, 20])
+def test_no_minute_exceeds_quota(burst, monkeypatch):
+    times = send_times(RateLimiter(75, burst), 300, monkeypatch)
+    assert times[burst - 1] == 0.0
+    assert busiest_minute(times) == 75
+
+
+def test_default_steady_rate_is_full_quota(monkeypatch):
+    times = send_times(RateLimiter(75, 1), 300, monkeypatch)
+    assert times[-1] - times[-76] == pytest.approx(60.0)
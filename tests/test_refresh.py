@@ -0,0 +1,82 @@
+import time
+from datetime import timedelta
+
+import indicators
+import market_calendar
+import refresh_scheduler
+from response_cache import weekly_expiry
+
+
+def weekly_payload(closes):
+    """TIME_SERIES_WEEKLY payload with one bar per {date: close}"""
+    return {'Weekly Time Series': {
+        day: {'1. open': '100.0', '2. high': str(close + 1), '3. low': '99.0',
+              '4. close': str(close), '5. volume': '1000'}
+        for day, close in closes.items()
+    }}
+
+
+def test_weekly_cache_expires_at_next_weekly_data():
+    close = market_calendar.last_weekly_close()
+    fetched = close - timedelta(hours=2)
+    assert weekly_expiry(fetched.timestamp()) == (close + refresh_scheduler.WEEKLY_DATA_DELAY).timestamp()
+
+
+def test_refresh_ignores_payload_cached_before_weekly_close(agent):
+    published = refresh_scheduler.weekly_data_published()
+    close = published - refresh_scheduler.WEEKLY_DATA_DELAY
+    week = close.date().isoformat()
+    previous = (close.date() - timedelta(days=7)).isoformat()
+    before_close = weekly_payload({previous: 100.0, week: 101.0})
+    after_close = weekly_payload({previous: 100.0, week: 105.0})
+
+    agent.db.stocks.insert_one({
+        'symbol': 'TEST',
+        'last_bar_date': week,
+        'latest_bar': agent.process_time_series(before_close['Weekly Time Series']).latest(),
+        'last_fetch': (close - timedelta(hours=2)).isoformat(),
+        'fundamentals_fetch': close.isoformat()
+    })
+    # Still within its TTL, e.g. stored by the screener or an older cache entry
+    key = agent.api_manager.cache.make_key('TIME_SERIES_WEEKLY', 'TEST')
+    agent.api_manager.cache._store(key, time.time() + 3600, before_close)
+
+    requested = []
+
+    def fetch(symbol, function):
+        requested.append(function)
+        return after_close
+
+    agent.api_manager._fetch = fetch
+    assert agent.update_stock_data(['TEST'])['updated'] == 1
+
+    assert requested == ['TIME_SERIES_WEEKLY']
+    stored = agent.db.stocks.find_one({'symbol': 'TEST'})
+    assert stored['latest_bar']['close'] == 105.0
+    assert not refresh_scheduler.weekly_stale(stored)
+
+
+def test_revised_bar_in_lookback_rebuilds_indicator_state(agent):
+    close = refresh_scheduler.weekly_data_published() - refresh_scheduler.WEEKLY_DATA_DELAY
+    week = close.date()
+    history = {(week - timedelta(weeks=i)).isoformat(): 100.0 + (i * 7) % 13 for i in range(1, 61)}
+    payloads = {'OVERVIEW': {'Sector': 'TECHNOLOGY', 'Industry': 'SOFTWARE', 'MarketCapitalization': '1000'}}
+    agent.api_manager._fetch = lambda symbol, function: payloads[function]
+
+    payloads['TIME_SERIES_WEEKLY'] = weekly_payload(history)
+    agent.update_stock_data(['TEST'])
+    agent.db.stocks.update_one({'symbol': 'TEST'}, {'$set': {'last_fetch': (close - timedelta(days=1)).isoformat()}})
+
+    revised = (week - timedelta(weeks=3)).isoformat()
+    history[revised] += 40
+    history[week.isoformat()] = 110.0
+    payloads['TIME_SERIES_WEEKLY'] = weekly_payload(history)
+    assert agent.update_stock_data(['TEST'])['updated'] == 1
+
+    expected = indicators.IndicatorState.from_bars(
+        agent.process_time_series(payloads['TIME_SERIES_WEEKLY']['Weekly Time Series'])
+    )
+    stored = agent.db.stocks.find_one({'symbol': 'TEST'})
+    assert stored['last_bar_date'] == week.isoformat()
+    assert stored['indicator_state'] == expected.to_document()
+    assert agent.db_manager.get_bars('TEST').get(revised)['close'] == history[revised]
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+
+from refresh_scheduler import (
+    RefreshScheduler, fundamentals_due, next_refresh, FUNDAMENTALS_MAX_AGE, SCHEDULER_MAX_SLEEP
+)
+
+SATURDAY = datetime(2024, 6, 15, 12, 0, tzinfo=timezone.utc)
+MONDAY_OPEN = datetime(2024, 6, 17, 13, 30, tzinfo=timezone.utc)
+TUESDAY = datetime(2024, 6, 18, 15, 0, tzinfo=timezone.utc)
+
+
+def stored_stock(fundamentals_fetch):
+    return {
+        'symbol': 'TEST',
+        'last_bar_date': '2024-06-14',
+        'last_fetch': SATURDAY.isoformat(),
+        'fundamentals_fetch': fundamentals_fetch.isoformat()
+    }
+
+
+def test_overdue_fundamentals_wait_for_the_next_session():
+    stored = stored_stock(SATURDAY - FUNDAMENTALS_MAX_AGE - timedelta(days=2))
+    assert fundamentals_due(stored, SATURDAY) == MONDAY_OPEN
+    assert next_refresh(stored, SATURDAY) == MONDAY_OPEN
+    assert fundamentals_due(stored, TUESDAY) == TUESDAY
+
+
+def test_fundamentals_due_during_a_session_keep_their_time():
+    stored = stored_stock(TUESDAY - FUNDAMENTALS_MAX_AGE)
+    assert fundamentals_due(stored, SATURDAY) == TUESDAY
+
+
+def test_watchlist_topup_waits_for_the_next_session():
+    db = mongomock.MongoClient().db
+    db.watchlist.insert_many([{'symbol': 'TEST'}])
+    scheduler = RefreshScheduler(db)
+    scheduler.sync_watchlist(SATURDAY)
+    scheduler.last_topup = SATURDAY - timedelta(days=1)
+    assert scheduler.topup_due_at(SATURDAY) == MONDAY_OPEN
+
+    scheduler.last_quotes = SATURDAY
+    scheduler.pop_due(SATURDAY + timedelta(days=3))
+    assert scheduler.next_wakeup(SATURDAY) == SATURDAY + timedelta(seconds=SCHEDULER_MAX_SLEEP)
+
+
+def test_full_watchlist_is_not_topped_up(monkeypatch):
+    monkeypatch.setattr('refresh_scheduler.WATCHLIST_SIZE', 1)
+    db = mongomock.MongoClient().db
+    db.watchlist.insert_one({'symbol': 'TEST'})
+    scheduler = RefreshScheduler(db)
+    scheduler.sync_watchlist(SATURDAY)
+    assert scheduler.topup_due_at(SATURDAY) is None
@@ -0,0 +1,29 @@
+import threading
+
+import stock_stream
+
+
+def test_poll_delivers_quote_only_update(agent, monkeypatch):
+    monkeypatch.setattr(stock_stream, 'STREAM_POLL_INTERVAL', 0.05)
+    agent.db.watchlist.insert_one({'symbol': 'TEST'})
+    agent.db.stocks.insert_one({
+        'symbol': 'TEST',
+        'latest_bar': {'close': 100.0, 'volume': 1000},
+        'indicators': {'ao': 1.0, 'ac': 0.5},
+        'last_update': '2024-01-05T17:00:00'
+    })
+    broadcaster = stock_stream.ChangeBroadcaster(agent.db)
+    subscriber = stock_stream.Subscriber()
+    broadcaster._subscribers.add(subscriber)
+    threading.Thread(target=broadcaster._poll, daemon=True).start()
+    assert subscriber.wait(0.2) == []
+
+    agent.api_manager.bulk_quotes_supported = True
+    monkeypatch.setattr(
+        agent.api_manager, 'get_bulk_quotes',
+        lambda symbols, fallback=True, failed=None: {'TEST': {'price': 101.5, 'volume': 2500}}
+    )
+    assert agent.refresh_quotes()['updated'] == 1
+
+    deltas = subscriber.wait(2)
+    assert deltas == [{'symbol': 'TEST', 'price': 101.5, 'volume': 2500, 'ao': 1.0, 'ac': 0.5}]
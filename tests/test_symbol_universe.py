@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+import pytest
+
+import symbol_universe
+from symbol_universe import SymbolUniverse, UNIVERSE_COLLECTION
+
+WRITE_BATCH_SIZE = 10
+
+
+def listing(symbols, fail_after=None):
+    for i, symbol in enumerate(symbols):
+        if i == fail_after:
+            raise ConnectionError('listing stream interrupted')
+        yield {'symbol': symbol, 'name': f"{symbol} Corp", 'exchange': 'NYSE'}
+
+
+def test_interrupted_listing_leaves_universe_stale(agent, monkeypatch):
+    monkeypatch.setattr(symbol_universe, 'WRITE_BATCH_SIZE', WRITE_BATCH_SIZE)
+    universe = SymbolUniverse(agent.db, agent.api_manager)
+    monkeypatch.setattr(agent.api_manager, 'iter_listing', lambda: listing(['OLD']))
+    assert universe.refresh() == 1
+    assert not universe.is_stale()
+    last_refresh = universe.last_refresh() - timedelta(days=2)
+    universe.metadata.update_one({'_id': UNIVERSE_COLLECTION}, {'$set': {'refreshed_at': last_refresh}})
+
+    # One full batch is written before the stream breaks
+    symbols = [f"S{i:04d}" for i in range(WRITE_BATCH_SIZE + 10)]
+    monkeypatch.setattr(agent.api_manager, 'iter_listing', lambda: listing(symbols, fail_after=WRITE_BATCH_SIZE + 5))
+    with pytest.raises(ConnectionError):
+        universe.refresh()
+    assert universe.collection.count_documents({}) == WRITE_BATCH_SIZE + 1
+    assert universe.last_refresh() == last_refresh
+    assert universe.is_stale()
+
+    monkeypatch.setattr(agent.api_manager, 'iter_listing', lambda: listing(symbols))
+    assert universe.refresh() == len(symbols)
+    assert not universe.is_stale()
+    assert universe.collection.count_documents({'symbol': 'OLD'}) == 0
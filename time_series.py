@@ -0,0 +1,55 @@
+import json
+from operator import itemgetter
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library decoder is used instead
+    orjson = None
+
+PRICE_FIELDS = ('open', 'high', 'low', 'close')
+_PRICE_KEYS = itemgetter('1. open', '2. high', '3. low', '4. close')
+
+
+def loads(data):
+    """Decode a JSON document (bytes or str) with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(value):
+    """Encode to JSON text; the inverse of loads"""
+    if orjson is not None:
+        return orjson.dumps(value).decode()
+    return json.dumps(value)
+
+
+def parse_dates(date_strs):
+    """ISO date strings -> int64 days since 1970-01-01 (parsed by NumPy in C)"""
+    return np.array(date_strs, dtype='datetime64[D]').astype(np.int64)
+
+
+def format_dates(days):
+    """int64 days since 1970-01-01 -> list of 'YYYY-MM-DD' strings"""
+    return np.datetime_as_string(np.asarray(days, dtype='datetime64[D]')).tolist()
+
+
+def weekly_columns(time_series):
+    """Columns for a 'Weekly Time Series' mapping, oldest bar first
+
+    Returns {'date': int64 days since epoch, 'open'/'high'/'low'/'close':
+    float64, 'volume': int64}. The string fields are converted by NumPy in
+    bulk instead of one float()/int() call per value.
+    """
+    rows = list(time_series.values())
+    dates = parse_dates(list(time_series))
+    prices = np.array([value for row in rows for value in _PRICE_KEYS(row)], dtype=np.float64).reshape(-1, 4)
+    volume = np.array([row['5. volume'] for row in rows], dtype=np.int64)
+    # Alpha Vantage sends the newest bar first
+    order = np.argsort(dates, kind='stable')
+    columns = {'date': dates[order]}
+    for i, field in enumerate(PRICE_FIELDS):
+        columns[field] = prices[order, i]
+    columns['volume'] = volume[order]
+    return columns